@@ -4,74 +4,155 @@ A mean scriptoid for pulling all pertinent voting information directly off the M
 Also note this is for Firefox, not Chrome. Easy to switch look it up 
 IMPORTANT NOTES: Read through the scrip and check for anything you need to change, listed below with their line of code
 
-Line  42: Change the xpath locator to the element you place in the actions list for your desired results page.
-Line 122: Your Spotify Username
-Line 123: Your Spotify Password
-Line 126: The HTML Selector for whatever league you are trying to enter. The one I have input is unique to me as I am in several leagues.
-Line 127: Change the xpath locator to the abs xpath for whatever results page you want, make sure the element you have selected is the one that highlights both the button and "Results" hyperlink.
-Line 135: Make sure to change the user name list to whatever players were present that round. I just wrote a list of all of them in a text file and used macros to make it useful as a list
-Line 138: Same as above but real names
-Line 154: Change to path to temp text file needed to store text pulled from web page. Make this file yourself idk i'm lazy 
-Line 163: Change to path from above, this time file is reading line by line
-line 212: Change to path of CSV you would like to store in
+Line 243: Your Spotify Username
+Line 244: Your Spotify Password
+Line 245: The HTML Selector for whatever league you are trying to enter. The one I have input is unique to me as I am in several leagues.
+Line 246: Change the xpath locator to the abs xpath for whatever results page you want, make sure the element you have selected is the one that highlights both the button and "Results" hyperlink.
+Line 270: Make sure to change the user name list to whatever players were present that round. I just wrote a list of all of them in a text file and used macros to make it useful as a list
+Line 273: Same as above but real names
+line 341: Change to path of CSV you would like to store in
 
 Will edit maybe to be a little bit more flexible and create voter lists from a master index
-Could be improved on wait time if I could figure out explicit waits for Selenium instead of using time.sleep
-Would like to also loop the driver to collect all rounds when the league is done for one big master list.
-Also think there is a way to avoid needing the temporary text file but am too lazy to figure it out
+Each action waits explicitly for its element (see perform_actions) and the time spent on every step is printed once the results page is up.
+To collect every round of a finished league into one big master list, use python cli.py crawl (see crawler.py, logs in with the actions below minus the round button).
+Instead of editing the CHANGE lines you can also pass everything in, see MlScraper below or python cli.py scrape --help.
+No temporary text file anymore, the scraped lines are parsed as they come (see iter_song_records).
 I could also make it so names are autogenerated from the scrape but did that part at 1AM and don't feel like changing it yet.
 -------------------------------------------------------------------------------
 """
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support import expected_conditions as EC
+import re
 import time
-import numpy as np
-import pandas as pd
-
-# Function to click through music league page dependent on actions defined by HTML path
-def perform_actions(driver, actions):
+from collections import namedtuple
+
+# Selenium, numpy and pandas are imported inside the functions that need them, so importing this file (or running cli.py --help) is instant and
+# the parsing functions can be used without a browser
+
+# Name of the expected condition each type of action waits for before it is performed
+ACTION_CONDITIONS = {
+    "click": "element_to_be_clickable",
+    "send_keys": "visibility_of_element_located",
+}
+
+# Function to click through music league page dependent on actions defined by HTML path. Each action only waits until its element is ready (up to
+# timeout seconds, or a 4th tuple entry to override it for that action) and is retried if the page re-renders the element out from under it.
+# Returns a list of (action_type, locator, seconds) so you can see where the time goes
+def perform_actions(driver, actions, timeout=10, retries=3):
+    from selenium.common.exceptions import StaleElementReferenceException
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    timings = []
     try:
-        for action_type, locator, value in actions:
-            time.sleep(1.75)
-            element = driver.find_element(*locator)
-            if action_type == "click":
-                if locator == (By.XPATH, "ABS XPATH HERE"): #CHANGE for different results page
-                    driver.execute_script("arguments[0].scrollIntoView();", element)
-                    time.sleep(1)
-                ActionChains(driver).move_to_element(element).click().perform()
-                #print(f"Clicked on element: {locator}")    #delete the '#' if you want to see what locator is being clicked
-            elif action_type == "send_keys":
-                element.send_keys(value)
-                #print(f"Sent keys '{value}' to element: {locator}")   #same if you want to see what keys are being entered
+        for action in actions:
+            action_type, locator, value = action[:3]
+            action_timeout = action[3] if len(action) > 3 else timeout
+            start = time.perf_counter()
+            for attempt in range(retries):
+                try:
+                    element = WebDriverWait(driver, action_timeout).until(getattr(EC, ACTION_CONDITIONS[action_type])(locator))
+                    if action_type == "click":
+                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+                        ActionChains(driver).move_to_element(element).click().perform()
+                        #print(f"Clicked on element: {locator}")    #delete the '#' if you want to see what locator is being clicked
+                    elif action_type == "send_keys":
+                        element.send_keys(value)
+                        #print(f"Sent keys '{value}' to element: {locator}")   #same if you want to see what keys are being entered
+                    break
+                except StaleElementReferenceException:
+                    if attempt == retries - 1:
+                        raise
+            timings.append((action_type, locator, time.perf_counter() - start))
 
     except Exception as e:
         print(f"Error during action: {e}")
+    return timings
+
+# Function to wait until the page has finished loading and at least one element matching locator is on it, instead of sleeping a fixed time
+def wait_for_results(driver, locator, timeout=10):
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    start = time.perf_counter()
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return document.readyState") == "complete")
+    WebDriverWait(driver, timeout).until(EC.presence_of_element_located(locator))
+    return ("wait", locator, time.perf_counter() - start)
+
+# Function to print how long each step took, slowest first
+def print_timings(timings):
+    for action_type, locator, seconds in sorted(timings, key=lambda step: step[2], reverse=True):
+        print(f"{seconds:6.2f}s  {action_type:<9} {locator[1]}")
+    print(f"{sum(step[2] for step in timings):6.2f}s  total")
+
+# JavaScript run in the browser to collect the rendered text of every element matching an XPath in a single WebDriver round trip
+TEXT_SNAPSHOT_JS = """
+var snapshot = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var texts = [];
+for (var i = 0; i < snapshot.snapshotLength; i++) {
+    texts.push(snapshot.snapshotItem(i).innerText.trim());
+}
+return texts;
+"""
+
+# Tags that start a new line when the browser renders text, used when working from saved HTML
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+              "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "tr", "ul"}
+
+# Function to pull the text of every element matching xpath with one execute_script call instead of a find_elements call plus one .text call per
+# element. Skips the first skip elements (page header) and returns the same ordered list of lines the old loop wrote to the temp text file
+def get_result_lines(driver, xpath, skip=5):
+    return split_lines(driver.execute_script(TEXT_SNAPSHOT_JS, xpath)[skip:])
+
+# Same as above but from a copy of the page's HTML (driver.page_source, or a saved file) parsed locally with lxml, so no per element calls at all
+def get_result_lines_from_html(page_html, xpath, skip=5):
+    from lxml import html as lxml_html
+    return split_lines([rendered_text(element) for element in lxml_html.fromstring(page_html).xpath(xpath)][skip:])
+
+# Function to approximate the browser's rendered text (innerText) of an lxml element: whitespace collapsed, block elements on their own lines
+def rendered_text(element):
+    parts = []
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else ""
+        if tag not in ("script", "style", ""):
+            block = tag in BLOCK_TAGS or tag == "br"
+            if block:
+                parts.append("\n")
+            parts.append(node.text or "")
+            for child in node:
+                walk(child)
+            if block:
+                parts.append("\n")
+        parts.append(node.tail or "" if node is not element else "")
+    walk(element)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+# Function to split element texts into lines the same way writing them to a file and reading it back with readlines() did
+def split_lines(texts):
+    return [line for text in texts for line in re.split(r"\r\n|\r|\n", text)]
 
 # Function to search for voters not present in a submitted song, adds a 0 and no comment
-def voter_fill(sublist):
+def voter_fill(sublist, voter_names):
+    present = set(sublist)
     for conditional_string in voter_names:
-        if conditional_string not in sublist:
+        if conditional_string not in present:
+            present.add(conditional_string)
             sublist.append(conditional_string)
             sublist.append('0')
             sublist.append('No Comment')
     return sublist
 
-# Function to add no comment for submitter if they did not comment    
-def SubmitCMT_fill(sublist):
-    for conditional_string in voter_names:
-        if conditional_string == sublist[6]:
-            sublist.insert(6, 'No Comment')
+# Function to add no comment for submitter if they did not comment. voter_names can be a list or a set, it is only used for lookups
+def SubmitCMT_fill(sublist, voter_names):
+    if sublist[6] in voter_names:
+        sublist.insert(6, 'No Comment')
     return sublist
 
-# Function to add a 0 if someone left a comment but didn't vote
-def NoVoteCMT_fill(sublist):
+# Function to add a 0 if someone left a comment but didn't vote, even a comment with numbers in it. voter_names can be a list or a set, it is only used for lookups
+def NoVoteCMT_fill(sublist, voter_names):
     for index, item in enumerate(sublist):
         if item in voter_names:
-            if contains_number(sublist[index + 1]):
+            if is_points(sublist[index + 1]):
                 continue
             else:
                 sublist.insert(index + 1, '0')   
@@ -79,19 +160,38 @@ def NoVoteCMT_fill(sublist):
             continue
     return sublist
 
-# Create the data frame, going through each row column by column. First 6 col are always song info, then next cols are sorted to their repective voter cols
-def dfCreate(list, df):
-    for rowidx, sublist in enumerate(list):
-        for colidx, item in enumerate(sublist):
-            if colidx <= 6:
-                df.iloc[rowidx, colidx] = item  
-                continue
-            else:
-                if item in voter_names:
-                    df.iloc[rowidx, Columns.index(item)] = sublist[sublist.index(item) + 1]
-                    continue
-                else:
-                    continue
+# One song of a round: its name, the username of whoever submitted it and the points each voter (by username) gave it
+SongRecord = namedtuple("SongRecord", ["song", "submitter", "points"])
+
+# Function to turn one song's filled in list into a SongRecord. The first 7 items are always song info (see SongInfo), after that every voter's
+# username is followed by the points they gave, e.g. "+3" or "-1"
+def song_record(sublist, voter_names):
+    points = {}
+    for index in range(len(SongInfo), len(sublist) - 1):
+        item = sublist[index]
+        if item in voter_names and item not in points:
+            points[item] = int(sublist[index + 1].replace('+', ''))
+    return SongRecord(sublist[SongInfo.index('Song')], sublist[SongInfo.index('Submitted By')].replace('Submitted by ', ''), points)
+
+# Create the data frame in one go from a list of SongRecords: Song, Submitted By (real name), then an integer column of points per voter (real names)
+def round_data_frame(records, voter_names, names):
+    import numpy as np
+    import pandas as pd
+
+    voter_index = {voter: idx for idx, voter in enumerate(voter_names)}
+    rows, cols, values = [], [], []
+    for row, record in enumerate(records):
+        for voter, value in record.points.items():
+            rows.append(row)
+            cols.append(voter_index[voter])
+            values.append(value)
+    points = np.zeros((len(records), len(voter_names)), dtype=np.int64)
+    points[rows, cols] = values
+
+    real_names = dict(zip(voter_names, names))
+    df = pd.DataFrame(points, columns=list(names[:len(voter_names)]) + voter_names[len(names):])
+    df.insert(0, 'Submitted By', [real_names.get(record.submitter) for record in records])
+    df.insert(0, 'Song', [record.song for record in records])
     return df
 
 #Needed to check for number in str in one of the other functions
@@ -100,110 +200,143 @@ def contains_number(input_string):
         if char.isdigit():
             return True
     return False  
-          
-#Rename columns from usernames to real names
-def rename_columns_from_index(df, start_index, new_column_names):
-    if start_index >= 0 and start_index < len(df.columns):
-        for i, new_name in enumerate(new_column_names):
-            df.rename(columns={df.columns[start_index + i]: new_name}, inplace=True)
-    else:
-        print("Start index is out of range.")
-    
-    return df
-
-#open web driver
-driver = webdriver.Firefox()
-url = "https://app.musicleague.com/"
-driver.get(url)
-
-# List of actions where each action is a tuple: (action_type, locator, value) You can change the locator depending on what selector works best for the element on the webpage. It varies
-actions = [
-    ("click", (By.CSS_SELECTOR, "div.row:nth-child(3) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1)"), None), 
-    ("send_keys", (By.ID, "login-username"), "USERNAME"), #CHANGE to your spotify username
-    ("send_keys", (By.ID, "login-password"), "PASSWORD"), #CHANGE to your spotify password
-    ("click", (By.CSS_SELECTOR, "#login-button"), None),
-    ("click", (By.CSS_SELECTOR, ".Button-qlcn5g-0"), None),
-    ("click", (By.XPATH, "XPATH OF SPECIFIED MUSIC LEAGUE"), None), #CHANGE This element is unique to your music league browser, Make sure to select xpath League desired
-    ("click", (By.XPATH, "XPATH OF ROUND REULTS BUTTON"), None), #CHANGE This is the element for the round result button
-
-    # Add more actions here if needed
-]
-
-SongInfo = ['Song', 'Artist', 'Album', 'Total Votes', 'Total Voters', 'Submitted By', 'Submitter comment']
-
-#CHANGE Make sure this list is relevant to the round you are trying to collect data for. This is a list of all the voter usernames you will have to enter     
-voter_names = []
-
-#CHANGE Same as above, but with players actual names. You can keep this the same as the list above if you don't personally know the group
-names = []
-
-Columns = SongInfo + voter_names
-
-if __name__ == "__main__":
 
-    perform_actions(driver, actions)
-
-    time.sleep(2)
-
-    all_elements = driver.find_elements(By.XPATH, "//div[3]/div[1]/div[2]//*[normalize-space(text()) != '']")  # This selects all child elements within the main body of the results page that produce visible text
- 
-    with open('EXAMPLE.txt', "w", encoding="utf-8") as outp: #CHANGE to a text file you have stored to write all text to so it can be read back line by line
-        for index, element in enumerate(all_elements):
-            if index < 5:  # Delete header data
-                continue
-            outp.write(element.text + '\n')
-    outp.close() 
-        
-    driver.quit() 
-    
-    with open('EXAMPLE.txt', 'r', encoding="utf-8") as inp:  #CHANGE to same text file as above but now reading for sublists
-        lines = inp.readlines()
-    
-    lines_above = 5
-    sublists = []
+# Function to check if an item is a vote's points, a whole number with an optional sign. A comment like "top 10 of the year" is not
+def is_points(input_string):
+    return re.fullmatch(r'[+-]?\d+', input_string.strip()) is not None
+          
+# Function to split the text lines of one round's results page into songs as the lines come in, yielding each song's filled in list (song info,
+# then every voter's username, points and comment) as soon as the next song starts. A song's info is the 5 lines above its "Submitted by" line, so
+# only the song in progress is held in memory. lines can be any iterable, e.g. get_result_lines() or an open text file
+def iter_song_records(lines, voter_names, lines_above=5):
+    voter_set = set(voter_names)
     current_sublist = []
 
-    #Parse txt file into sublists by round, 
-    for idx, line in enumerate(lines):
+    for line in lines:
+        line = line[:-1] if line.endswith('\n') else line #clean new line chars
         if line.startswith('Submitted'): #Seaches for submutted in text
-            if current_sublist:
-                sublists.append(current_sublist[:-lines_above]) #returns rest of lines and appeanding 5 in front of detected string
-            current_sublist = [lines[i] for i in range(max(0, idx - lines_above), idx + 1)] 
+            song = current_sublist[:-lines_above] #returns rest of lines, the last 5 belong to the song that starts here
+            if song:
+                yield fill_song(song, voter_names, voter_set)
+            current_sublist = current_sublist[-lines_above:] + [line]
         else:
             current_sublist.append(line)
 
-    # Append the last sublist if there are remaining items
+    # The last song runs to the end of the page
     if current_sublist:
-        sublists.append(current_sublist)  # Append the last sublist without duplicated lines
+        yield fill_song(current_sublist, voter_names, voter_set)
 
-    if sublists and not sublists[0]:
-        sublists.pop(0)
+# Function to fill in the gaps of one song's list: voters that didn't vote, the submitter not commenting and comments without points
+def fill_song(sublist, voter_names, voter_set=None):
+    voter_set = set(voter_names) if voter_set is None else voter_set
+    return NoVoteCMT_fill(SubmitCMT_fill(voter_fill(sublist, voter_names), voter_set), voter_set)
 
+# Function to turn the text lines of one round's results page into a data frame with a row per song: the song, who submitted it (real name) and the
+# points every voter gave it (real names as columns). voter_names is the roster of usernames as they appear on the page and names their real names
+def parse_round_lines(lines, voter_names, names):
+    voter_set = set(voter_names)
+    records = [song_record(sublist, voter_set) for sublist in iter_song_records(lines, voter_names)]
+    return round_data_frame(records, voter_names, names).sort_values(by='Submitted By')
 
+url = "https://app.musicleague.com/"
 
-    CleanList = [[item[:-1] if item.endswith('\n') else item for item in sublist] for sublist in sublists] #clean new line chars
+USERNAME = "USERNAME" #CHANGE to your spotify username
+PASSWORD = "PASSWORD" #CHANGE to your spotify password
+LEAGUE_XPATH = "XPATH OF SPECIFIED MUSIC LEAGUE" #CHANGE This element is unique to your music league browser, Make sure to select xpath League desired
+ROUND_XPATH = "XPATH OF ROUND REULTS BUTTON" #CHANGE This is the element for the round result button
+
+# Function to build the list of actions where each action is a tuple: (action_type, locator, value) You can change the locator depending on what selector works best for the element on the webpage. It varies
+# Leave round_xpath out to stop on the league page (what crawler.py does)
+def build_actions(username, password, league_xpath, round_xpath=None):
+    from selenium.webdriver.common.by import By
+
+    actions = [
+        ("click", (By.CSS_SELECTOR, "div.row:nth-child(3) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1)"), None), 
+        ("send_keys", (By.ID, "login-username"), username),
+        ("send_keys", (By.ID, "login-password"), password),
+        ("click", (By.CSS_SELECTOR, "#login-button"), None),
+        ("click", (By.CSS_SELECTOR, ".Button-qlcn5g-0"), None),
+        ("click", (By.XPATH, league_xpath), None),
+
+        # Add more actions here if needed
+    ]
+    if round_xpath is not None:
+        actions.append(("click", (By.XPATH, round_xpath), None))
+    return actions
 
+SongInfo = ['Song', 'Artist', 'Album', 'Total Votes', 'Total Voters', 'Submitted By', 'Submitter comment']
 
-    # Apply the conditional_fill function to each sublist
-    voter_filled = [voter_fill(sublist) for sublist in CleanList]
-    SubmitCMT_filled = [SubmitCMT_fill(sublist) for sublist in voter_filled]
-    NoVoteCMT_filled = [NoVoteCMT_fill(sublist) for sublist in SubmitCMT_filled]
+#CHANGE Make sure this list is relevant to the round you are trying to collect data for. This is a list of all the voter usernames you will have to enter     
+voter_names = []
 
-    df = pd.DataFrame(columns=Columns)
-    while len(NoVoteCMT_filled) >= len(df):
-         df.loc[len(df)] = [None] * len(Columns)
-    dfCreation = dfCreate(NoVoteCMT_filled, df)
-    rename_columns_from_index(dfCreation, 7, names)
+#CHANGE Same as above, but with players actual names. You can keep this the same as the list above if you don't personally know the group
+names = []
+
+# This selects all child elements within the main body of the results page that produce visible text
+RESULTS_XPATH = "//div[3]/div[1]/div[2]//*[normalize-space(text()) != '']"
+
+# The scraper with all of its settings passed in (defaults are the CHANGE values above). The browser is only started the first time .driver is used,
+# so creating one is free and nothing else in this file needs a browser
+class MlScraper:
+
+    def __init__(self, voter_names, names=None, username=USERNAME, password=PASSWORD, league_xpath=LEAGUE_XPATH, round_xpath=ROUND_XPATH, url=url,
+                 driver_factory=None, timeout=10):
+        self.voter_names = list(voter_names)
+        self.names = list(names) if names else self.voter_names  # No real names, keep the usernames
+        self.username = username
+        self.password = password
+        self.league_xpath = league_xpath
+        self.round_xpath = round_xpath
+        self.url = url
+        self.driver_factory = driver_factory
+        self.timeout = timeout
+        self.timings = []
+        self._driver = None
+
+    # Starts the browser (Firefox unless a driver_factory was given) on url the first time it is needed
+    @property
+    def driver(self):
+        if self._driver is None:
+            if self.driver_factory is None:
+                from selenium import webdriver
+                self.driver_factory = webdriver.Firefox
+            self._driver = self.driver_factory()
+            self._driver.get(self.url)
+        return self._driver
+
+    # Logs in and opens the league page
+    def login(self):
+        self.timings += perform_actions(self.driver, build_actions(self.username, self.password, self.league_xpath), timeout=self.timeout)
+        return self.driver
+
+    # Logs in, opens the round's results and returns its text lines
+    def scrape_round_lines(self):
+        actions = build_actions(self.username, self.password, self.league_xpath, self.round_xpath)
+        self.timings += perform_actions(self.driver, actions, timeout=self.timeout)
+        self.timings.append(wait_for_results(self.driver, ("xpath", RESULTS_XPATH), timeout=self.timeout))
+        return get_result_lines(self.driver, RESULTS_XPATH, skip=5)  # Skip the 5 lines of header data
+
+    # Same as above but parsed into the round's data frame (see parse_round_lines)
+    def scrape_round(self):
+        return parse_round_lines(self.scrape_round_lines(), self.voter_names, self.names)
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == "__main__":
 
-    #Block to clean up the data frame
-    dfCreation = dfCreation.iloc[:-1]
-    dfCreation['Submitted By'] = dfCreation['Submitted By'].str.replace('Submitted by ', '')
-    replacement_dict = dict(zip(voter_names, names))
-    dfCreation['Submitted By'] = dfCreation['Submitted By'].map(replacement_dict)
-    sorted_df = dfCreation.sort_values(by='Submitted By')
-    ColDropdf = sorted_df.drop(columns = ['Artist', 'Album', 'Total Votes', 'Total Voters', 'Submitter comment'])
-    for col in ColDropdf.columns:
-        ColDropdf[col] = ColDropdf[col].str.replace('+', '')
+    # The lines go straight into the parser, no temp text file. To parse a saved page instead, pass it open(path) or get_result_lines_from_html()
+    with MlScraper(voter_names, names) as scraper:
+        ColDropdf = scraper.scrape_round()
+    print_timings(scraper.timings)
 
     ColDropdf.to_csv('OUTPUT.csv', index=False) #CHANGE To whatever CSV you want to write to then just import to sheets
 
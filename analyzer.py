@@ -1,116 +1,373 @@
-from collections import Counter
+from collections import Counter, OrderedDict
+
+import numpy as np
 
 
 class MlAnalyzer:
 
-    def __init__(self, parser):
+    def __init__(self, parser, cache_size = 1024, cache_bytes = 256 * 1024 * 1024):
         self.parser = parser
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self._reload_version = None
+        self._version = None
+        #   (method, round, submitter) -> (result, bytes held by the result's arrays)
+        self._cache = OrderedDict()
+        self._cache_nbytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._league = None
+        self._neighbors = None
+
+    def _sync(self):
+        #   Rounds never change once loaded, so everything cached is only thrown away when the parser reloads its data. When
+        # a round is appended, only league-wide results (those not tied to a round) go stale.
+        if self._reload_version != self.parser.reload_version:
+            self._cache.clear()
+            self._cache_nbytes = 0
+            self._league = None
+            self._neighbors = None
+            self._reload_version = self.parser.reload_version
+            self._version = self.parser.version
+        elif self._version != self.parser.version:
+            for key in [key for key in self._cache if key[1] is None]:
+                self._cache_nbytes -= self._cache.pop(key)[1]
+            self._version = self.parser.version
+
+    def _cached(self, method, round_number, submitter_name, compute):
+        #   Least recently used cache of results keyed by (method, round, submitter), holding at most <cache_size> results and
+        # <cache_bytes> bytes of arrays (the per-round similarity matrices grow with the square of the submitters). Results
+        # are shared between callers, so they must not be modified.
+        self._sync()
+        key = (method, round_number, submitter_name)
+        if key in self._cache:
+            self._cache_hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key][0]
+        self._cache_misses += 1
+        value = compute()
+        nbytes = _nbytes(value)
+        #   A result too large for the whole cache is returned without evicting everything else to make room for it.
+        if nbytes > self.cache_bytes:
+            return value
+        self._cache[key] = (value, nbytes)
+        self._cache_nbytes += nbytes
+        while len(self._cache) > self.cache_size or self._cache_nbytes > self.cache_bytes:
+            self._cache_nbytes -= self._cache.popitem(last=False)[1][1]
+        return value
+
+    def cache_info(self):
+        return {"hits": self._cache_hits, "misses": self._cache_misses, "size": len(self._cache), "max_size": self.cache_size,
+                "bytes": self._cache_nbytes, "max_bytes": self.cache_bytes}
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cache_nbytes = 0
+        self._league = None
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def calculate_similarity_matrix_for_round(self, round_number):
+        #   Returns the round's submitters along with an (n x n) matrix where entry [i, j] is how similar submitter j's votes
+        # were to submitter i's, normalized by the absolute number of points submitter i awarded. Rows for submitters who did
+        # not vote in the round are NaN.
+        return self._cached("calculate_similarity_matrix_for_round", round_number, None,
+                            lambda: self._calculate_similarity_matrix_for_round(round_number))
+
+    def _calculate_similarity_matrix_for_round(self, round_number):
+        submitters = self.parser.get_submitters(round_number)
+        votes = self.parser.get_vote_matrix(round_number, submitters).astype(np.int32)
+        net_diff = np.zeros((len(submitters), len(submitters)), dtype=np.int64)
+        #   Accumulate the pairwise L1 distance one song at a time so memory stays at (n x n) regardless of the round's size.
+        for song_votes in votes:
+            net_diff += np.abs(song_votes[:, None] - song_votes[None, :])
+        abs_totals = np.abs(votes).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarity = 1 - (net_diff / (2 * abs_totals[:, None]))
+        similarity[abs_totals == 0] = np.nan
+        return submitters, similarity
 
     def calculate_similar_submitters_for_round(self, round_number, submitter_name):
+        return self._cached("calculate_similar_submitters_for_round", round_number, submitter_name,
+                            lambda: self._calculate_similar_submitters_for_round(round_number, submitter_name))
+
+    def _calculate_similar_submitters_for_round(self, round_number, submitter_name):
+        submitters, similarity = self.calculate_similarity_matrix_for_round(round_number)
         #   If <submitter_name> did not vote in the round, there's nothing to do.
-        if (self.parser.get_absolute_total_points_for_submitter(round_number, submitter_name) == 0):
-            # print("Submitter \"" + submitter_name + "\" did not vote in round \"" + str(round_number) + "\".")
+        if submitter_name not in submitters:
             return
-        submitters = self.parser.get_submitters(round_number)
-        submitter_votes = self.parser.get_song_votes_for_submitter(round_number, submitter_name)
-        submitter_vote_total = 0
-        net_diff = dict(zip(submitters, [0] * len(submitters)))
-        for person in submitters:
-            compare_votes = self.parser.get_song_votes_for_submitter(round_number, person)
-            assert(len(submitter_votes) == len(compare_votes))
-            #   <vote> should be a key,value pair where the key is the song name and the value is the number of points.
-            for song in submitter_votes:
-                net_diff[person] += abs(submitter_votes[song] - compare_votes[song])
-        #   Remove key,value pair for <submitter_name> as it's always zero since it's comparing the person to themself.
-        del net_diff[submitter_name]
-        adjusted_dict = dict.fromkeys(net_diff.keys())
-        for key in net_diff:
-            adjusted_dict[key] = 1 - (net_diff[key] / (2 * self.parser.get_absolute_total_points_for_submitter(round_number, submitter_name)))
-        return adjusted_dict
+        idx = submitters.index(submitter_name)
+        if np.isnan(similarity[idx, idx]):
+            return
+        #   Leave out <submitter_name> as it's always a perfect match when comparing the person to themself.
+        return {person: value for person, value in zip(submitters, similarity[idx].tolist()) if person != submitter_name}
+
+    def calculate_league_similarity(self):
+        #   Averages every round's similarity matrix into one league-wide (n x n) matrix over all submitters, alongside the
+        # number of mutual rounds each pair was compared in. Each round is only folded in once, so after an append only the
+        # new round's matrix is computed.
+        self._sync()
+        if self._league is None:
+            self._league = {"submitters": [], "idx": {}, "totals": np.zeros((0, 0)), "counts": np.zeros((0, 0), dtype=np.int64),
+                            "round_max": [], "round_min": [], "rounds": set(), "mean": np.zeros((0, 0)), "version": None}
+        league = self._league
+        if league["version"] != self.parser.version:
+            submitters = self.parser.get_submitters()
+            grow = len(submitters) - len(league["submitters"])
+            if grow > 0:
+                league["totals"] = np.pad(league["totals"], ((0, grow), (0, grow)))
+                league["counts"] = np.pad(league["counts"], ((0, grow), (0, grow)))
+                #   Per-round (value, person, round) extremes for each submitter, starting from the same bounds as the report.
+                league["round_max"] += [(0.0, None, None)] * grow
+                league["round_min"] += [(100.0, None, None)] * grow
+                league["submitters"] = submitters
+                league["idx"] = {person: i for i, person in enumerate(submitters)}
+            for round_number in self.parser.get_rounds():
+                if round_number not in league["rounds"]:
+                    self._fold_round_similarity(league, round_number)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                league["mean"] = league["totals"] / league["counts"]
+            league["version"] = self.parser.version
+        return league["submitters"], league["mean"], league["counts"]
+
+    def _fold_round_similarity(self, league, round_number):
+        round_submitters, similarity = self.calculate_similarity_matrix_for_round(round_number)
+        similarity = similarity.copy()
+        pos = np.array([league["idx"][person] for person in round_submitters], dtype=np.intp)
+        voted = ~np.isnan(similarity.diagonal())
+        compared = np.outer(voted, np.ones(len(round_submitters), dtype=bool))
+        np.fill_diagonal(compared, False)
+        block = np.ix_(pos, pos)
+        league["totals"][block] += np.where(compared, similarity, 0.0)
+        league["counts"][block] += compared
+        np.fill_diagonal(similarity, -np.inf)
+        max_idx = similarity.argmax(axis=1)
+        np.fill_diagonal(similarity, np.inf)
+        min_idx = similarity.argmin(axis=1)
+        round_max, round_min = league["round_max"], league["round_min"]
+        for i in np.flatnonzero(voted):
+            if similarity[i, max_idx[i]] > round_max[pos[i]][0]:
+                round_max[pos[i]] = (similarity[i, max_idx[i]].item(), round_submitters[max_idx[i]], round_number)
+            if similarity[i, min_idx[i]] < round_min[pos[i]][0]:
+                round_min[pos[i]] = (similarity[i, min_idx[i]].item(), round_submitters[min_idx[i]], round_number)
+        league["rounds"].add(round_number)
 
     def calculate_similar_submitters(self, submitter_name):
-        rounds = self.parser.get_rounds(submitter_name=submitter_name)
-        submitters = self.parser.get_submitters()
-        submitters.remove(submitter_name)
-        aggregate_dict = {person: [] for person in submitters}
-        for round in rounds:
-            similar_votes = self.calculate_similar_submitters_for_round(round, submitter_name)
-            #   If <similar_votes> is None, then that person submitted but did not vote in round <round>, so we skip it.
-            if similar_votes is None:
-                continue
-            for person in similar_votes:
-                aggregate_dict[person].append(similar_votes[person])
+        return self._cached("calculate_similar_submitters", None, submitter_name,
+                            lambda: self._calculate_similar_submitters(submitter_name))
+
+    def _calculate_similar_submitters(self, submitter_name):
+        submitters, mean, counts = self.calculate_league_similarity()
+        self_idx = submitters.index(submitter_name)
         average_list = []
-        for person in aggregate_dict:
-            if len(aggregate_dict[person]) <= 0:
+        for idx, person in enumerate(submitters):
+            if idx == self_idx or counts[self_idx, idx] <= 0:
                 continue
-            average_list.append((person, sum(aggregate_dict[person]) / len(aggregate_dict[person]), len(aggregate_dict[person])))
+            average_list.append((person, mean[self_idx, idx].item(), counts[self_idx, idx].item()))
         return sorted(average_list, key=lambda tup: tup[1])
 
+    def calculate_top_similar_submitters(self, submitter_name, k = 3):
+        #   The <k> most and least similar submitters to <submitter_name> across the league, as a dict of "most_similar" and
+        # "least_similar" lists of (name, average overlap, mutual rounds), i.e. calculate_similar_submitters()[::-1][:k] and
+        # calculate_similar_submitters()[:k] without building and sorting the whole list. Answered from the neighbor index
+        # when one covering <k> has been built.
+        self._sync()
+        if self._neighbors is not None and k <= self._neighbors["k"]:
+            self._update_neighbor_index()
+            if submitter_name in self._neighbors["entries"]:
+                most, least = self._neighbors["entries"][submitter_name]
+                return {"most_similar": most[:k], "least_similar": least[:k]}
+        row = self._similarity_row(submitter_name)
+        if row is None:
+            print("Submitter \"" + str(submitter_name) + "\" does not exist.")
+            return None
+        return self._top_k(*row, k)
+
+    def build_neighbor_index(self, k = 3):
+        #   Precomputes the <k> most and least similar submitters for everyone, so calculate_top_similar_submitters() is a
+        # lookup. It is read off the league-wide averages (see calculate_league_similarity()), which fold every round in
+        # once, and follows appended rounds by redoing only the people who voted in them, since nobody else's averages change.
+        self._sync()
+        self._neighbors = {"k": k, "entries": {}, "rounds": set(), "version": None}
+        self._update_neighbor_index()
+
+    def _update_neighbor_index(self):
+        neighbors = self._neighbors
+        if neighbors["version"] == self.parser.version:
+            return
+        stale = set()
+        for round_number in self.parser.get_rounds():
+            if round_number not in neighbors["rounds"]:
+                stale.update(self.parser.get_submitters(round_number))
+                neighbors["rounds"].add(round_number)
+        submitters, _, counts = self.calculate_league_similarity()
+        for idx, person in enumerate(submitters):
+            if person in stale or person not in neighbors["entries"]:
+                top = self._top_k(submitters, self._league["totals"][idx], counts[idx], idx, neighbors["k"])
+                neighbors["entries"][person] = (top["most_similar"], top["least_similar"])
+        neighbors["version"] = self.parser.version
+
+    def _round_votes(self, round_number):
+        #   A round's (songs x submitters) votes with each submitter's column in the league and absolute points awarded.
+        return self._cached("_round_votes", round_number, None, lambda: self._calculate_round_votes(round_number))
+
+    def _calculate_round_votes(self, round_number):
+        submitters = self.parser.get_submitters(round_number)
+        votes = self.parser.get_vote_matrix(round_number, submitters).astype(np.int32)
+        league_idx = {person: idx for idx, person in enumerate(self.parser.get_submitters())}
+        return {"submitters": submitters, "pos": np.array([league_idx[person] for person in submitters], dtype=np.intp),
+                "votes": votes, "abs_totals": np.abs(votes).sum(axis=0, dtype=np.int64)}
+
+    def _similarity_row(self, submitter_name):
+        #   Row <submitter_name> of calculate_league_similarity() without computing the rest of the matrix: the league's
+        # submitters along with the summed per-round overlaps and mutual round counts against each of them. Each round only
+        # needs the songs <submitter_name> gave points to, since elsewhere the L1 distance is just the other voter's total.
+        submitters = self.parser.get_submitters()
+        if submitter_name not in submitters:
+            return None
+        totals = np.zeros(len(submitters))
+        counts = np.zeros(len(submitters), dtype=np.int64)
+        for round_number in dict.fromkeys(self.parser.get_rounds(submitter_name=submitter_name)):
+            round_votes = self._round_votes(round_number)
+            idx = round_votes["submitters"].index(submitter_name)
+            abs_total = round_votes["abs_totals"][idx]
+            if abs_total == 0:
+                continue
+            votes = round_votes["votes"]
+            voted_songs = np.flatnonzero(votes[:, idx])
+            others = votes[voted_songs]
+            net_diff = round_votes["abs_totals"] + (np.abs(votes[voted_songs, idx][:, None] - others) - np.abs(others)).sum(axis=0)
+            compared = np.arange(len(round_votes["submitters"])) != idx
+            pos = round_votes["pos"][compared]
+            totals[pos] += 1 - (net_diff[compared] / (2 * abs_total))
+            counts[pos] += 1
+        return submitters, totals, counts, submitters.index(submitter_name)
+
+    @staticmethod
+    def _top_k(submitters, totals, counts, self_idx, k):
+        #   Picks the <k> highest and lowest averages with argpartition, ordered as in the fully sorted list: ascending by
+        # average with ties in submitter order, so the most similar come out with ties in reverse submitter order.
+        candidates = np.flatnonzero(counts > 0)
+        candidates = candidates[candidates != self_idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            averages = totals[candidates] / counts[candidates]
+
+        def select(keys):
+            if len(keys) > k:
+                threshold = np.partition(keys, k - 1)[k - 1]
+                below = np.flatnonzero(keys < threshold)
+                chosen = np.concatenate([below, np.flatnonzero(keys == threshold)[:k - len(below)]])
+            else:
+                chosen = np.arange(len(keys))
+            return chosen[np.lexsort((chosen, keys[chosen]))]
+
+        least = select(averages) if k > 0 else []
+        #   Negating the order puts later submitters first among ties, as reversing the sorted list does.
+        most = (len(candidates) - 1 - select(-averages[::-1])) if k > 0 else []
+        entry = lambda pick: (submitters[candidates[pick]], averages[pick].item(), counts[candidates[pick]].item())
+        return {"most_similar": [entry(pick) for pick in most], "least_similar": [entry(pick) for pick in least]}
+
+    def get_league_metrics(self):
+        #   Builds the stats behind get_formatted_metrics_for_submitter() for every submitter from a single pass over the
+        # league, returning a JSON-serializable dict keyed by submitter name.
+        return self._cached("get_league_metrics", None, None, self._get_league_metrics)
+
+    def _get_league_metrics(self):
+        submitters, mean, counts = self.calculate_league_similarity()
+        round_max, round_min = self._league["round_max"], self._league["round_min"]
+        receivers, voters, received_points = self.parser.get_cumulative_points_matrix()
+        voter_cols = {voter: col for col, voter in enumerate(voters)}
+        #   Giver x receiver points, aligned to <submitters> on both axes (receivers who never submitted stay at zero).
+        awarded = np.zeros((len(submitters), len(submitters)), dtype=np.int64)
+        receiver_idx = [submitters.index(person) for person in receivers if person in submitters]
+        receiver_rows = [row for row, person in enumerate(receivers) if person in submitters]
+        awarded[:, receiver_idx] = received_points[np.ix_(receiver_rows, [voter_cols[person] for person in submitters])].T
+        submitted = np.zeros(len(submitters), dtype=bool)
+        submitted[receiver_idx] = True
+        metrics = {}
+        for idx, person in enumerate(submitters):
+            #   Nobody can be the one they gave the most or least points to, so leave themselves out of these comparisons.
+            others = np.arange(len(submitters)) != idx
+            given = np.flatnonzero(others & submitted)
+            received = np.flatnonzero(others)
+            similar = self._top_k(submitters, self._league["totals"][idx], counts[idx], idx, 3)
+            metrics[person] = {
+                "rounds": len(self.parser.get_rounds(submitter_name=person)),
+                "points": self.parser.get_total_points_for_submitter(person),
+                "most_points_given": self._format_points_extreme(submitters, given, awarded[idx, given], np.argmax),
+                "least_points_given": self._format_points_extreme(submitters, given, awarded[idx, given], np.argmin),
+                "most_points_received": self._format_points_extreme(submitters, received, awarded[received, idx], np.argmax),
+                "least_points_received": self._format_points_extreme(submitters, received, awarded[received, idx], np.argmin),
+                "most_similar": [{"name": entry[0], "overlap": entry[1], "mutual_rounds": entry[2]} for entry in similar["most_similar"]],
+                "least_similar": [{"name": entry[0], "overlap": entry[1], "mutual_rounds": entry[2]} for entry in similar["least_similar"]],
+                "highest_round_overlap": self._format_round_extreme(round_max[idx]),
+                "lowest_round_overlap": self._format_round_extreme(round_min[idx]),
+            }
+        return metrics
+
+    @staticmethod
+    def _format_points_extreme(submitters, candidates, points, select):
+        if len(candidates) == 0:
+            return None
+        pick = select(points)
+        return {"name": submitters[candidates[pick]], "points": points[pick].item()}
+
+    @staticmethod
+    def _format_round_extreme(extreme):
+        if extreme[1] is None:
+            return None
+        return {"round": extreme[2], "name": extreme[1], "overlap": extreme[0]}
+
+    def get_metrics_for_submitter(self, submitter_name):
+        return self.get_league_metrics()[submitter_name]
+
     def get_formatted_metrics_for_submitter(self, submitter_name):
-        rounds = self.parser.get_rounds(submitter_name=submitter_name)
-        points = self.parser.get_total_points_for_submitter(submitter_name)
-        similar_list = self.calculate_similar_submitters(submitter_name)
-        assert(len(similar_list) > 1)
+        metrics = self.get_metrics_for_submitter(submitter_name)
+        assert(len(metrics["most_similar"]) > 1)
         print("--- Music League: Stats for " + submitter_name + " ---")
-        print("Participated in " + str(len(rounds)) + " rounds.")
-        print("Received " + str(points) + " points.")
-        sum_df = self.parser.get_cumulative_points_awarded()
-        submitters = self.parser.get_submitters()
-        votes_to_list = sum_df[submitter_name].tolist()
-        votes_from_list = sum_df.loc[sum_df["Submitter"] == submitter_name].iloc[:, 1:].iloc[0].tolist()
-        #   Need to remove the submitter we're getting info on from these lists as it doesn't make sense if they come up here
-        # (i.e. PersonA gave the least points to PersonA).
-        self_idx = submitters.index(submitter_name)
-        del votes_to_list[self_idx]
-        del votes_from_list[self_idx]
-        del submitters[self_idx]
-        print("Gave the most points to " + str(submitters[votes_to_list.index(max(votes_to_list))]) + " (" + str(max(votes_to_list)) + ").")
-        print("Gave the least points to " + str(submitters[votes_to_list.index(min(votes_to_list))]) + " (" + str(min(votes_to_list)) + ").")
-        print("Received the most points from " + str(submitters[votes_from_list.index(max(votes_from_list))]) + " (" + str(max(votes_from_list)) + ").")
-        print("Received the least points from " + str(submitters[votes_from_list.index(min(votes_from_list))]) + " (" + str(min(votes_from_list)) + ").")
+        print("Participated in " + str(metrics["rounds"]) + " rounds.")
+        print("Received " + str(metrics["points"]) + " points.")
+        print("Gave the most points to " + str(metrics["most_points_given"]["name"]) + " (" + str(metrics["most_points_given"]["points"]) + ").")
+        print("Gave the least points to " + str(metrics["least_points_given"]["name"]) + " (" + str(metrics["least_points_given"]["points"]) + ").")
+        print("Received the most points from " + str(metrics["most_points_received"]["name"]) + " (" + str(metrics["most_points_received"]["points"]) + ").")
+        print("Received the least points from " + str(metrics["least_points_received"]["name"]) + " (" + str(metrics["least_points_received"]["points"]) + ").")
         print("How they voted compared to other participants...")
         print("  Most Similar - ")
-        for entry in similar_list[::-1][:3]:
-            print("    " + entry[0] + 
-              " had " + "{0:.0%}".format(entry[1]) + 
-              " overlap across " + str(entry[2]) + " mutual round(s).")
+        for entry in metrics["most_similar"]:
+            print("    " + entry["name"] + 
+              " had " + "{0:.0%}".format(entry["overlap"]) + 
+              " overlap across " + str(entry["mutual_rounds"]) + " mutual round(s).")
         print("  Least Similar - ")
-        for entry in similar_list[:3]:
-            print("    " + entry[0] + 
-              " had " + "{0:.0%}".format(entry[1]) + 
-              " overlap across " + str(entry[2]) + " mutual round(s).")
-        max_value = 0.0
-        min_value = 100.0
-        for round_num in rounds:
-            similar_list = self.calculate_similar_submitters_for_round(round_num, submitter_name)
-            if similar_list is None:
-                continue
-            for person in similar_list:
-                if similar_list[person] > max_value:
-                    max_value = similar_list[person]
-                    max_person = person
-                    max_round_num = round_num
-                if similar_list[person] < min_value:
-                    min_value = similar_list[person]
-                    min_person = person
-                    min_round_num = round_num
-        print("Highest voting overlap for a single round was in round number " + str(max_round_num) + ": " + max_person + " with " + "{0:.0%}".format(max_value) + " overlap.")
-        print("Lowest voting overlap for a single round was in round number " + str(min_round_num) + ": " + min_person + " with " + "{0:.0%}".format(min_value) + " overlap.")
+        for entry in metrics["least_similar"]:
+            print("    " + entry["name"] + 
+              " had " + "{0:.0%}".format(entry["overlap"]) + 
+              " overlap across " + str(entry["mutual_rounds"]) + " mutual round(s).")
+        highest = metrics["highest_round_overlap"]
+        lowest = metrics["lowest_round_overlap"]
+        print("Highest voting overlap for a single round was in round number " + str(highest["round"]) + ": " + highest["name"] + " with " + "{0:.0%}".format(highest["overlap"]) + " overlap.")
+        print("Lowest voting overlap for a single round was in round number " + str(lowest["round"]) + ": " + lowest["name"] + " with " + "{0:.0%}".format(lowest["overlap"]) + " overlap.")
 
     def find_biggest_oddball(self, round_number):
-        submitters = self.parser.get_submitters(round_number = round_number)
+        return self._cached("find_biggest_oddball", round_number, None, lambda: self._find_biggest_oddball(round_number))
+
+    def _find_biggest_oddball(self, round_number):
+        submitters, similarity = self.calculate_similarity_matrix_for_round(round_number)
+        similarity = similarity.copy()
+        voted = ~np.isnan(similarity.diagonal())
+        #   Nobody can be their own oddball, so push the diagonal to the end of every sorted row.
+        np.fill_diagonal(similarity, np.inf)
+        least_similar = np.argsort(similarity, axis=1, kind="stable")[:, :min(3, len(submitters) - 1)]
+        return self._rank_oddballs(submitters, least_similar, voted)
+
+    @staticmethod
+    def _rank_oddballs(submitters, least_similar, voted):
+        #   Everyone who is among the three least similar voters for at least half of the round's submitters.
         oddball_list = []
-        for person in submitters:
-            similar_dict = self.calculate_similar_submitters_for_round(round_number, person)
-            if similar_dict is None:
+        for idx in range(len(submitters)):
+            if not voted[idx]:
                 continue
-            similar_list = []
-            for person in similar_dict:
-                similar_list.append((person, similar_dict[person]))
-            sorted_list = sorted(similar_list, key=lambda tup: tup[1])
-            oddball_list.extend(sorted_list[:3])
-        oddball_dict = Counter(person[0] for person in oddball_list)
+            oddball_list.extend(submitters[other] for other in least_similar[idx])
+        oddball_dict = Counter(oddball_list)
         #   Trim down the list to a max of three people
         final_list = []
         for oddball in oddball_dict:
@@ -118,21 +375,142 @@ class MlAnalyzer:
                 final_list.append((oddball, oddball_dict[oddball] / len(submitters)))
         return sorted(final_list, key=lambda tup: tup[1])[::-1]
 
+    def find_biggest_oddballs(self):
+        #   find_biggest_oddball() for every round at once, as a dict keyed by round.
+        return self._cached("find_biggest_oddballs", None, None, self._find_biggest_oddballs)
+
+    def _find_biggest_oddballs(self):
+        rounds, rows, votes = self.parser.get_vote_tensor()
+        submitters, songs, submitter_cols = self._round_layout(rounds, rows)
+        width = rows.shape[1]
+        oddballs = {}
+        #   Each round's similarity matrix is (songs x songs) since everyone submits one song, so work through the season a
+        # batch of rounds at a time to keep the (rounds x songs x songs) arrays to a few million entries.
+        batch = max(1, 4000000 // max(1, width * width))
+        for start in range(0, len(rounds), batch):
+            cols = submitter_cols[start:start + batch]
+            #   [r, s, j] is the points the j-th submitter of round r gave its s-th song, as in the round's own matrix.
+            round_votes = np.take_along_axis(votes[start:start + batch], np.maximum(cols, 0)[:, None, :], axis=2)
+            round_votes[np.broadcast_to((cols < 0)[:, None, :], round_votes.shape)] = 0
+            net_diff = np.zeros((len(cols), width, width), dtype=np.int64)
+            for song in range(width):
+                song_votes = round_votes[:, song, :]
+                net_diff += np.abs(song_votes[:, :, None] - song_votes[:, None, :])
+            abs_totals = np.abs(round_votes).sum(axis=1, dtype=np.int64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                similarity = 1 - (net_diff / (2 * abs_totals[:, :, None]))
+            similarity[np.broadcast_to((cols < 0)[:, None, :], similarity.shape)] = np.inf
+            similarity[:, np.arange(width), np.arange(width)] = np.inf
+            least_similar = np.argsort(similarity, axis=2, kind="stable")[:, :, :3]
+            for offset, round_number in enumerate(rounds[start:start + batch]):
+                count = len(submitters[start + offset])
+                oddballs[round_number] = self._rank_oddballs(submitters[start + offset], least_similar[offset, :count, :min(3, count - 1)],
+                                                             abs_totals[offset, :count] > 0)
+        return oddballs
+
     def find_biggest_dumper(self, round_number):
-        rounds = self.parser.get_rounds()
-        #   list of tuples taking the form (submitter_name, song_name, voter_name, num_points)
-        dump_list = []
-        cum_points_df = self.parser.get_df(round_number=round_number)
-        submitters = self.parser.get_submitters(round_number=round_number)
-        dumpers_dict = dict(zip(submitters, [("", "", 0)] * len(submitters)))
-        for person in submitters:
-            value = max(cum_points_df[person])
-            idx = cum_points_df[person].idxmax()
-            if value > dumpers_dict[person][2]:
-                submitter = cum_points_df.loc[idx, "Submitter"]
-                song = self.parser.get_songs(round_number=round_number, submitter_name=submitter)
-                assert song is not None
-                dumpers_dict[person] = (submitter, song, value)
-        for person in submitters:
-            dump_list.append((dumpers_dict[person][0], dumpers_dict[person][1], person, dumpers_dict[person][2]))
-        return sorted(dump_list, key=lambda tup: tup[3])[len(dump_list) - 1]
\ No newline at end of file
+        #   Returns (submitter, song, voter, points) for the most points any one voter gave a single song in the round. Ties go
+        # to whoever submitted later in the round.
+        return self._cached("find_biggest_dumper", round_number, None, lambda: self._find_biggest_dumper(round_number))
+
+    def _find_biggest_dumper(self, round_number):
+        if round_number not in self.parser.get_rounds():
+            print("Round number \"" + str(round_number) + "\" does not exist.")
+            return None
+        #   Only this round's votes, so a single query doesn't pay for the season-wide pass behind find_biggest_dumpers().
+        submitters = self.parser.get_submitters(round_number)
+        votes = self.parser.get_vote_matrix(round_number, submitters)
+        dumped = np.maximum(votes.max(axis=0), 0)
+        voter = len(submitters) - 1 - np.argmax(dumped[::-1])
+        points = dumped[voter].item()
+        if points <= 0:
+            return ("", "", submitters[voter], 0)
+        song = np.argmax(votes[:, voter])
+        return (submitters[song], self.parser.get_songs(round_number)[song], submitters[voter], points)
+
+    def find_biggest_dumpers(self):
+        #   find_biggest_dumper() for every round at once, as a dict keyed by round.
+        return self._dumper_pass()["dumpers"]
+
+    def _dumper_pass(self):
+        return self._cached("_dumper_pass", None, None, self._calculate_dumper_pass)
+
+    def _calculate_dumper_pass(self):
+        rounds, rows, votes = self.parser.get_vote_tensor()
+        voters = self.parser.get_submitters()
+        submitters, songs, submitter_cols = self._round_layout(rounds, rows)
+        if len(rounds) == 0:
+            return {"voters": voters, "submitted": np.zeros((0, len(voters)), dtype=bool), "dumped": np.zeros((0, len(voters)), dtype=np.int32),
+                    "pick": np.zeros(0, dtype=np.intp), "dumpers": {}}
+        round_idx, song_idx = np.nonzero(rows >= 0)
+        voter_idx = submitter_cols[round_idx, song_idx]
+        #   Only a round's submitters count as its voters; where each of them submitted decides ties.
+        submitted = np.zeros((len(rounds), len(voters)), dtype=bool)
+        submitted[round_idx, voter_idx] = True
+        position = np.full((len(rounds), len(voters)), -1, dtype=np.intp)
+        np.maximum.at(position, (round_idx, voter_idx), song_idx)
+        #   The most points each voter gave one song in each round (padding can never win), and which song that was.
+        padded = np.where((rows >= 0)[:, :, None], votes, np.iinfo(np.int32).min)
+        best_song = padded.argmax(axis=1)
+        dumped = np.where(submitted, np.maximum(padded.max(axis=1), 0), 0)
+        top = np.where(submitted, dumped, -1).max(axis=1)
+        pick = np.where(submitted & (dumped == top[:, None]), position, -1).argmax(axis=1)
+        dumpers = {}
+        for idx, round_number in enumerate(rounds):
+            voter = pick[idx]
+            points = dumped[idx, voter].item()
+            if points > 0:
+                song = best_song[idx, voter]
+                dumpers[round_number] = (submitters[idx][song], songs[idx][song], voters[voter], points)
+            else:
+                dumpers[round_number] = ("", "", voters[voter], 0)
+        return {"voters": voters, "submitted": submitted, "dumped": dumped, "pick": pick, "dumpers": dumpers}
+
+    def get_dumper_leaderboard(self):
+        #   Ranks everyone who submitted by how many rounds they were the biggest dumper, then by the points of those dumps,
+        # as a list of {"name", "rounds", "points", "biggest"} where "biggest" is the most they gave one song all season.
+        dumper_pass = self._dumper_pass()
+        voters, submitted, dumped = dumper_pass["voters"], dumper_pass["submitted"], dumper_pass["dumped"]
+        picked = np.zeros_like(dumped)
+        picked[np.arange(len(dumped)), dumper_pass["pick"]] = dumped[np.arange(len(dumped)), dumper_pass["pick"]]
+        rounds = np.count_nonzero(picked > 0, axis=0)
+        points = picked.sum(axis=0, dtype=np.int64)
+        biggest = dumped.max(axis=0, initial=0)
+        leaderboard = [{"name": voters[idx], "rounds": rounds[idx].item(), "points": points[idx].item(), "biggest": biggest[idx].item()}
+                       for idx in np.flatnonzero(submitted.any(axis=0))]
+        return sorted(leaderboard, key=lambda entry: (-entry["rounds"], -entry["points"], entry["name"]))
+
+    def get_oddball_leaderboard(self):
+        #   Ranks everyone who was ever a round's oddball by how many rounds they were, then by their average share of the
+        # round's submitters that found them least similar, as a list of {"name", "rounds", "share"}.
+        tally = {}
+        for oddballs in self.find_biggest_oddballs().values():
+            for person, share in oddballs:
+                entry = tally.setdefault(person, {"name": person, "rounds": 0, "share": 0.0})
+                entry["rounds"] += 1
+                entry["share"] += share
+        for entry in tally.values():
+            entry["share"] /= entry["rounds"]
+        return sorted(tally.values(), key=lambda entry: (-entry["rounds"], -entry["share"], entry["name"]))
+
+    def _round_layout(self, rounds, rows):
+        #   Each round's submitters and songs in row order, along with a (rounds x songs) array of the submitters' voter
+        # columns, padded with -1 like <rows>.
+        voter_cols = {person: idx for idx, person in enumerate(self.parser.get_submitters())}
+        submitters = [self.parser.get_submitters(round_number) for round_number in rounds]
+        songs = [self.parser.get_songs(round_number) for round_number in rounds]
+        submitter_cols = np.full(rows.shape, -1, dtype=np.intp)
+        for idx, round_submitters in enumerate(submitters):
+            submitter_cols[idx, :len(round_submitters)] = [voter_cols[person] for person in round_submitters]
+        return submitters, songs, submitter_cols
+
+
+#   Approximate memory held by a cached result; the arrays inside it, however deeply nested in tuples, lists and dicts.
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return 0
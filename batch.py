@@ -0,0 +1,99 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzer import MlAnalyzer
+from parser import MlParser
+
+
+###############################################################################################################################
+# function find_league_files(pattern)
+#
+#   Gets a sorted list of league csv files from <pattern>, which is either a directory (every *.csv file directly inside it)
+#   or a glob pattern.
+
+def find_league_files(pattern):
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.csv")
+    return sorted(glob.glob(pattern))
+
+
+###############################################################################################################################
+# function analyze_league(filename, use_cache = False)
+#
+#   Runs the full analysis for a single league; similarity metrics for every submitter, the oddballs and biggest dumper of
+#   every round, the season's oddball and dumper leaderboards and the bar fight records. Returns a JSON-serializable
+#   dictionary of the results along with how long each step took (in seconds). Round numbers are used as (string) keys.
+
+def analyze_league(filename, use_cache = False):
+    timing = {}
+    start = time.perf_counter()
+    parser = MlParser()
+    parser.parse_ml_csv_file(filename, use_cache=use_cache)
+    analyzer = MlAnalyzer(parser)
+    timing["parse"] = time.perf_counter() - start
+
+    step = time.perf_counter()
+    metrics = analyzer.get_league_metrics()
+    timing["similarity"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    oddballs = {str(round_number): round_oddballs for round_number, round_oddballs in analyzer.find_biggest_oddballs().items()}
+    timing["oddballs"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    dumpers = {}
+    for round_number, (submitter, song, voter, points) in analyzer.find_biggest_dumpers().items():
+        dumpers[str(round_number)] = {"submitter": submitter, "song": song, "voter": voter, "points": points}
+    timing["dumpers"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    leaderboards = {"oddballs": analyzer.get_oddball_leaderboard(), "dumpers": analyzer.get_dumper_leaderboard()}
+    timing["leaderboards"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    bar_fight = list(parser.get_bf_records())
+    timing["bar_fight"] = time.perf_counter() - step
+
+    timing["total"] = time.perf_counter() - start
+    return {
+        "league": filename,
+        "metrics": metrics,
+        "oddballs": oddballs,
+        "dumpers": dumpers,
+        "leaderboards": leaderboards,
+        "bar_fight": bar_fight,
+        "timing": timing,
+    }
+
+
+###############################################################################################################################
+# function _analyze_league_safely(filename, use_cache)
+#
+#   Wraps analyze_league() so that one malformed league is reported in the combined output rather than failing the batch.
+
+def _analyze_league_safely(filename, use_cache):
+    start = time.perf_counter()
+    try:
+        return analyze_league(filename, use_cache=use_cache)
+    except Exception as e:
+        return {"league": filename, "error": repr(e), "timing": {"total": time.perf_counter() - start}}
+
+
+###############################################################################################################################
+# function run_batch(pattern, workers = None, use_cache = False)
+#
+#   Analyzes every league matched by <pattern> (see find_league_files()) in parallel across <workers> processes (one per CPU
+#   if not specified), returning the combined results in file order along with the overall wall time.
+
+def run_batch(pattern, workers = None, use_cache = False):
+    filenames = find_league_files(pattern)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        leagues = list(executor.map(_analyze_league_safely, filenames, [use_cache] * len(filenames)))
+    return {
+        "leagues": leagues,
+        "timing": {"wall": time.perf_counter() - start, "workers": workers or os.cpu_count(), "league_count": len(filenames)},
+    }
+
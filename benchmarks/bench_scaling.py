@@ -0,0 +1,179 @@
+"""
+Scaling benchmark for MlParser and MlAnalyzer over synthetic leagues of growing size (see synthetic_league.py).
+
+For every size tier it times parsing the csv, get_cumulative_points_awarded, get_bf_format, calculate_similar_submitters (one submitter,
+from a fresh analyzer so the league wide similarity is included), calculate_top_similar_submitters for the same submitter and
+build_neighbor_index, standings under 100 what-if scenarios, and find_biggest_oddball and find_biggest_dumper over every round (also
+from a fresh analyzer), along with their league wide find_biggest_oddballs and find_biggest_dumpers. Each step is run --repeat times and
+the best and median are kept. The results are printed as a table and written as JSON along with the versions and commit they were
+measured on, and --compare prints how a run stacks up against an earlier one.
+The v1000-r10 tier is left out by default since the similarity steps take minutes there; ask for it with --tiers.
+
+    python benchmarks/bench_scaling.py [--tiers NAME,...] [--repeat N] [-o RESULTS.json] [--compare OLD.json] [--data-dir DIR]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from analyzer import MlAnalyzer
+from parser import MlParser
+from scenarios import MlScenarioEngine, Scenario
+from synthetic_league import generate_league
+
+# Size tiers: growing the voters (and songs, one per voter) at a fixed number of rounds, then the rounds at a fixed number of voters
+TIERS = {
+    "v10-r10": {"rounds": 10, "voters": 10},
+    "v100-r10": {"rounds": 10, "voters": 100},
+    "v1000-r10": {"rounds": 10, "voters": 1000},
+    "v10-r100": {"rounds": 100, "voters": 10},
+    "v10-r500": {"rounds": 500, "voters": 10},
+    "v100-r100": {"rounds": 100, "voters": 100},
+}
+DEFAULT_TIERS = ["v10-r10", "v100-r10", "v10-r100", "v10-r500", "v100-r100"]
+
+
+# Function to get the csv for a tier, generating it into data_dir unless an identical one (same settings and seed) is already there
+def tier_csv(data_dir, settings, seed):
+    filename = os.path.join(data_dir, "league_r{rounds}_v{voters}".format(**settings) + "_s" + str(seed) + ".csv")
+    if not os.path.exists(filename):
+        generate_league(filename, seed=seed, **settings)
+    return filename
+
+
+def parse(filename):
+    parser = MlParser()
+    parser.parse_ml_csv_file(filename)
+    return parser
+
+
+def every_round(method_name):
+    def run(filename, parser):
+        return [getattr(MlAnalyzer(parser), method_name)(round_number) for round_number in parser.get_rounds()]
+    return run
+
+
+# Function to get the standings under 100 scenarios: each of the first 50 voters left out, then budgets of 1 to 50 points with downvotes clamped
+def whatif_sweep(filename, parser):
+    scenarios = [Scenario("without " + voter, exclude_voters=[voter]) for voter in parser.get_submitters()[:50]]
+    scenarios += [Scenario("budget " + str(budget), budget=budget, clamp=(0, None)) for budget in range(1, 101 - len(scenarios))]
+    return MlScenarioEngine(parser).standings(scenarios)
+
+
+# Steps timed for every tier, each a function of the csv and an already parsed MlParser. Analyzer steps start from a fresh MlAnalyzer so
+# its cache doesn't carry over between runs
+STEPS = [
+    ("parse", lambda filename, parser: parse(filename)),
+    ("get_cumulative_points_awarded", lambda filename, parser: parser.get_cumulative_points_awarded()),
+    ("get_bf_format", lambda filename, parser: parser.get_bf_format()),
+    ("calculate_similar_submitters", lambda filename, parser: MlAnalyzer(parser).calculate_similar_submitters(parser.get_submitters()[0])),
+    ("calculate_top_similar_submitters", lambda filename, parser: MlAnalyzer(parser).calculate_top_similar_submitters(parser.get_submitters()[0])),
+    ("build_neighbor_index", lambda filename, parser: MlAnalyzer(parser).build_neighbor_index()),
+    ("whatif_100_scenarios", whatif_sweep),
+    ("find_biggest_oddball", every_round("find_biggest_oddball")),
+    ("find_biggest_dumper", every_round("find_biggest_dumper")),
+    ("find_biggest_oddballs", lambda filename, parser: MlAnalyzer(parser).find_biggest_oddballs()),
+    ("find_biggest_dumpers", lambda filename, parser: MlAnalyzer(parser).find_biggest_dumpers()),
+]
+
+
+def run_tier(name, filename, settings, repeat):
+    parser = parse(filename)
+    results = []
+    for step, function in STEPS:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(filename, parser)
+            runs.append(time.perf_counter() - start)
+        results.append({
+            "tier": name,
+            "rounds": settings["rounds"],
+            "voters": settings["voters"],
+            "rows": len(parser.get_df()),
+            "step": step,
+            "best": min(runs),
+            "median": statistics.median(runs),
+            "runs": runs,
+        })
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_results(results, baseline=None):
+    # Best time of the same tier and step in the baseline run, if any
+    old = {(result["tier"], result["step"]): result["best"] for result in (baseline or {}).get("results", [])}
+    print(f"{'tier':<10} {'rows':>7} {'step':<34} {'best':>9} {'median':>9}" + (f" {'vs old':>8}" if old else ""))
+    for result in results:
+        line = f"{result['tier']:<10} {result['rows']:>7} {result['step']:<34} {result['best']:>9.4f} {result['median']:>9.4f}"
+        if (result["tier"], result["step"]) in old:
+            line += f" {old[(result['tier'], result['step'])] / result['best']:>7.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--tiers", default=",".join(DEFAULT_TIERS), help="comma separated tiers to run, out of " + ", ".join(TIERS))
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs per step")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic leagues")
+    arg_parser.add_argument("--data-dir", default=None, help="keep the generated leagues here (default: a temporary directory)")
+    arg_parser.add_argument("-o", "--output", default=None, help="JSON results file (default: benchmarks/results/scaling-<time>.json)")
+    arg_parser.add_argument("--compare", default=None, help="earlier JSON results to compare against (ratios above 1 are faster now)")
+    args = arg_parser.parse_args()
+
+    tiers = args.tiers.split(",")
+    unknown = [name for name in tiers if name not in TIERS]
+    if unknown:
+        arg_parser.error("unknown tiers: " + ", ".join(unknown))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        results = []
+        for name in tiers:
+            filename = tier_csv(data_dir, TIERS[name], args.seed)
+            results += run_tier(name, filename, TIERS[name], args.repeat)
+            print(f"Finished {name}", file=sys.stderr)
+
+    report = {"environment": environment(), "repeat": args.repeat, "seed": args.seed, "results": results}
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as inp:
+            baseline = json.load(inp)
+    print_results(results, baseline)
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(ROOT, "benchmarks", "results")
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, "scaling-" + report["environment"]["timestamp"].replace(":", "")[:17] + ".json")
+    with open(output, "w", encoding="utf-8") as outp:
+        json.dump(report, outp, indent=2)
+    print(f"Wrote {output}")
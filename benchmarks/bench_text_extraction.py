@@ -0,0 +1,110 @@
+"""
+Benchmark for reading the results page text: the old find_elements + per element .text loop against a single execute_script call and a
+page_source snapshot parsed locally with lxml.
+
+No browser is needed. A stand-in driver serves a saved results page (fixtures/round_results.html by default) and sleeps for --latency
+milliseconds on every WebDriver call, which is roughly what a local geckodriver round trip costs. Every method has to produce the same
+line list.
+
+    python benchmarks/bench_text_extraction.py [--html PATH] [--latency MS] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+from lxml import html as lxml_html
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MLScraper_v1 import RESULTS_XPATH, get_result_lines, get_result_lines_from_html, rendered_text, split_lines
+
+
+# Stand-in for a WebDriver session that serves a saved page and counts round trips
+class FixtureDriver:
+
+    def __init__(self, page_html, latency):
+        self._page_html = page_html
+        self._tree = lxml_html.fromstring(page_html)
+        self.latency = latency
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency)
+
+    def find_elements(self, by, xpath):
+        self._round_trip()
+        return [FixtureElement(self, element) for element in self._tree.xpath(xpath)]
+
+    def execute_script(self, script, xpath):
+        self._round_trip()
+        return [rendered_text(element) for element in self._tree.xpath(xpath)]
+
+    @property
+    def page_source(self):
+        self._round_trip()
+        return self._page_html
+
+
+class FixtureElement:
+
+    def __init__(self, driver, element):
+        self._driver = driver
+        self._element = element
+
+    @property
+    def text(self):
+        self._driver._round_trip()
+        return rendered_text(self._element)
+
+
+# The loop the scraper used before: one find_elements call, then one .text call per element
+def per_element_lines(driver, xpath, skip=5):
+    return split_lines([element.text for element in driver.find_elements("xpath", xpath)[skip:]])
+
+
+def page_source_lines(driver, xpath, skip=5):
+    return get_result_lines_from_html(driver.page_source, xpath, skip=skip)
+
+
+METHODS = [
+    ("per element .text", per_element_lines),
+    ("execute_script", get_result_lines),
+    ("page_source + lxml", page_source_lines),
+]
+
+
+def run(page_html, latency, repeat):
+    results = []
+    expected = None
+    for name, method in METHODS:
+        best = None
+        for _ in range(repeat):
+            driver = FixtureDriver(page_html, latency)
+            start = time.perf_counter()
+            lines = method(driver, RESULTS_XPATH)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if expected is None:
+            expected = lines
+        assert lines == expected, name + " produced different lines"
+        results.append((name, driver.round_trips, best, len(lines)))
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--html", default=os.path.join(ROOT, "fixtures", "round_results.html"), help="saved results page")
+    arg_parser.add_argument("--latency", type=float, default=2.0, help="simulated milliseconds per WebDriver call")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs per method; the best time is reported")
+    args = arg_parser.parse_args()
+
+    with open(args.html, "r", encoding="utf-8") as inp:
+        page_html = inp.read()
+    results = run(page_html, args.latency / 1000, args.repeat)
+    baseline = results[0][2]
+    print(f"{'method':<20} {'round trips':>11} {'seconds':>9} {'speedup':>8} {'lines':>6}")
+    for name, round_trips, seconds, line_count in results:
+        print(f"{name:<20} {round_trips:>11} {seconds:>9.4f} {baseline / seconds:>7.1f}x {line_count:>6}")
@@ -0,0 +1,68 @@
+"""
+Deterministic synthetic Music League data in the csv format MlParser.parse_ml_csv_file reads (Round, Song, Submitter, then one column of
+points per voter). The same arguments and seed always write the same file.
+
+Every round a random songs_per_round of the voters submit one song each. Each of them then spreads point_budget points over the other
+songs of the round, favouring the round's more appealing songs, except for the fraction given by sparsity who sit the round out and give
+nothing. Voters who didn't submit never vote.
+
+    python benchmarks/synthetic_league.py OUT.csv [--rounds N] [--voters N] [--songs-per-round N] [--point-budget N] [--sparsity F] [--seed N]
+"""
+import argparse
+
+import numpy as np
+
+
+# Function to yield the rows of a synthetic league one at a time as lists: round number, song, submitter, then each voter's points
+def league_rows(rounds=10, voters=10, songs_per_round=None, point_budget=10, sparsity=0.0, seed=0):
+    songs_per_round = voters if songs_per_round is None else songs_per_round
+    if not 2 <= songs_per_round <= voters:
+        raise ValueError("songs_per_round must be between 2 and the number of voters.")
+    if not 0.0 <= sparsity < 1.0:
+        raise ValueError("sparsity must be at least 0 and less than 1.")
+    rng = np.random.default_rng(seed)
+    names = voter_names(voters)
+    for round_number in range(1, rounds + 1):
+        submitters = np.sort(rng.choice(voters, size=songs_per_round, replace=False))
+        # How much every submitter likes every song: the song's appeal for the round times their own taste
+        appeal = rng.gamma(2.0, size=songs_per_round)
+        weights = appeal * rng.gamma(1.0, size=(songs_per_round, songs_per_round))
+        np.fill_diagonal(weights, 0.0)  # Nobody votes for their own song
+        given = rng.multinomial(point_budget, weights / weights.sum(axis=1, keepdims=True))
+        given[rng.random(songs_per_round) < sparsity] = 0
+        points = np.zeros((songs_per_round, voters), dtype=np.int64)
+        points[:, submitters] = given.T
+        for song, submitter in enumerate(submitters):
+            yield [round_number, "Song " + str(round_number) + "-" + str(song + 1), names[submitter]] + points[song].tolist()
+
+
+# Function to get the names used for the synthetic voters, zero padded so they sort in order
+def voter_names(voters):
+    width = len(str(voters))
+    return ["P" + str(idx + 1).zfill(width) for idx in range(voters)]
+
+
+# Function to write a synthetic league to filename, returning the number of rows written. Takes the same arguments as league_rows()
+def generate_league(filename, rounds=10, voters=10, songs_per_round=None, point_budget=10, sparsity=0.0, seed=0):
+    row_count = 0
+    with open(filename, "w", encoding="utf-8") as outp:
+        outp.write(",".join(["Round", "Song", "Submitter"] + voter_names(voters)) + "\n")
+        for row in league_rows(rounds, voters, songs_per_round, point_budget, sparsity, seed):
+            outp.write(",".join(map(str, row)) + "\n")
+            row_count += 1
+    return row_count
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("output", help="csv file to write")
+    arg_parser.add_argument("--rounds", type=int, default=10, help="number of rounds")
+    arg_parser.add_argument("--voters", type=int, default=10, help="number of voters (every submitter is also a voter)")
+    arg_parser.add_argument("--songs-per-round", type=int, default=None, help="songs submitted each round (default: one per voter)")
+    arg_parser.add_argument("--point-budget", type=int, default=10, help="points each voter hands out per round")
+    arg_parser.add_argument("--sparsity", type=float, default=0.0, help="fraction of submitters that don't vote in a round")
+    arg_parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = arg_parser.parse_args()
+
+    row_count = generate_league(args.output, args.rounds, args.voters, args.songs_per_round, args.point_budget, args.sparsity, args.seed)
+    print(f"Wrote {row_count} songs to {args.output}")
@@ -0,0 +1,271 @@
+"""
+Command line for the whole tool:
+
+    python cli.py scrape   scrape one round's results off the Music League site into a csv
+    python cli.py crawl    scrape every round of a league into one master csv
+    python cli.py parse    turn a saved results page (or its text) into a csv, no browser needed
+    python cli.py analyze  similarity metrics for one league csv
+    python cli.py batch    analyze every league csv in a directory or glob in parallel
+    python cli.py serve    answer JSON queries about one or more leagues from a local server
+    python cli.py export   stream bar fight frames or player metrics of one or more leagues to a file
+    python cli.py whatif   standings of one league under a list of what-if scenarios
+
+Each command only imports what it needs (selenium and pandas are slow to import), so --help and the analysis commands on a
+cached league start right away. Run python cli.py <command> --help for the options.
+"""
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import sys
+
+
+###############################################################################################################################
+# function _roster(args)
+#
+#   Gets the (voter_names, names) roster from the --voters and --names options, falling back on the lists in
+#   MLScraper_v1.py. Real names default to the usernames.
+
+def _roster(args):
+    import MLScraper_v1 as scraper
+    voter_names = args.voters.split(",") if args.voters else list(scraper.voter_names)
+    if args.names:
+        names = args.names.split(",")
+    elif args.voters:
+        names = voter_names
+    else:
+        names = list(scraper.names)
+    if names and len(names) != len(voter_names):
+        sys.exit("--names needs exactly one real name per voter in --voters")
+    return voter_names, names
+
+
+###############################################################################################################################
+# function _scraper(args, round_xpath = None)
+#
+#   Gets an MlScraper for the command line options. The password is read from the ML_PASSWORD environment variable, or
+#   prompted for when a --username is given without one.
+
+def _scraper(args, round_xpath = None):
+    import MLScraper_v1 as scraper
+    voter_names, names = _roster(args)
+    password = os.environ.get("ML_PASSWORD")
+    if password is None:
+        password = getpass.getpass("Spotify password: ") if args.username else scraper.PASSWORD
+    return scraper.MlScraper(voter_names, names, username=args.username or scraper.USERNAME, password=password,
+                             league_xpath=args.league_xpath or scraper.LEAGUE_XPATH, round_xpath=round_xpath, url=args.url or scraper.url,
+                             timeout=args.timeout)
+
+
+def _write_output(text, output):
+    if output is None:
+        print(text)
+    else:
+        with open(output, "w", encoding="utf-8") as outp:
+            outp.write(text + "\n")
+
+
+def scrape_command(args):
+    import MLScraper_v1 as scraper
+    with _scraper(args, round_xpath=args.round_xpath or scraper.ROUND_XPATH) as round_scraper:
+        round_df = round_scraper.scrape_round()
+    scraper.print_timings(round_scraper.timings)
+    round_df.to_csv(args.output, index=False)
+    print(f"Wrote {len(round_df)} songs to {args.output}")
+
+
+def crawl_command(args):
+    import MLScraper_v1 as scraper
+    from crawler import ROUND_LINKS_XPATH, crawl_league
+    with _scraper(args) as league_scraper:
+        master_df, round_links, timings = crawl_league(league_scraper, workers=args.workers, links_xpath=args.links_xpath or ROUND_LINKS_XPATH,
+                                                       login=not args.no_login)
+    scraper.print_timings(timings)
+    master_df.to_csv(args.output, index=False)
+    print(f"Wrote {len(master_df)} songs from {len(round_links)} rounds to {args.output}")
+
+
+def parse_command(args):
+    import MLScraper_v1 as scraper
+    from crawler import round_lines_to_rows
+    voter_names, names = _roster(args)
+    with open(args.input, "r", encoding="utf-8") as inp:
+        if args.input.endswith((".html", ".htm")):
+            lines = scraper.get_result_lines_from_html(inp.read(), args.xpath or scraper.RESULTS_XPATH, skip=5)
+        else:
+            lines = inp
+        if args.round is None:
+            round_df = scraper.parse_round_lines(lines, voter_names, names)
+        else:
+            round_df = round_lines_to_rows(args.round, lines, voter_names, names)
+    if args.output is None:
+        print(round_df.to_csv(index=False), end="")
+    else:
+        round_df.to_csv(args.output, index=False)
+
+
+def analyze_command(args):
+    from analyzer import MlAnalyzer
+    from parser import MlParser
+    parser = MlParser()
+    analyzer = MlAnalyzer(parser)
+    if args.profile is None:
+        _analyze(args, parser, analyzer)
+        return
+    from profiling import profile
+    with profile(analyzer, format=args.profile):
+        _analyze(args, parser, analyzer)
+
+
+def _analyze(args, parser, analyzer):
+    parser.parse_ml_csv_file(args.csv, use_cache=args.cache)
+    if args.submitter is None:
+        _write_output(json.dumps(analyzer.get_league_metrics(), indent=2), args.output)
+    elif args.output is None:
+        analyzer.get_formatted_metrics_for_submitter(args.submitter)
+    else:
+        with open(args.output, "w", encoding="utf-8") as outp, contextlib.redirect_stdout(outp):
+            analyzer.get_formatted_metrics_for_submitter(args.submitter)
+
+
+def batch_command(args):
+    from batch import run_batch
+    results = run_batch(args.pattern, workers=args.workers, use_cache=args.cache)
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+        return
+    with open(args.output, "w", encoding="utf-8") as outp:
+        json.dump(results, outp, indent=2)
+    for league in results["leagues"]:
+        status = ("error: " + league["error"]) if "error" in league else "{0:.3f}s".format(league["timing"]["total"])
+        print(league["league"] + ": " + status)
+    print("Analyzed " + str(results["timing"]["league_count"]) + " leagues in " + "{0:.3f}s".format(results["timing"]["wall"]) + ".")
+
+
+def serve_command(args):
+    import asyncio
+    from server import MlServer, league_arguments
+    try:
+        leagues = league_arguments(args.csv, use_cache=args.cache, neighbors=args.neighbors)
+    except ValueError as e:
+        sys.exit(str(e))
+    server = MlServer(leagues, port=args.port, poll=None if args.poll <= 0 else args.poll, workers=args.workers, neighbors=args.neighbors)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def export_command(args):
+    from exporters import EXPORT_FORMATS, export_leagues
+    if args.format not in EXPORT_FORMATS:
+        sys.exit("Unknown export format \"" + args.format + "\", expected one of " + ", ".join(EXPORT_FORMATS))
+    if args.output is None:
+        export_leagues(args.csv, args.what, sys.stdout, format=args.format, use_cache=args.cache)
+        return
+    with open(args.output, "w", encoding="utf-8", newline="") as outp:
+        count = export_leagues(args.csv, args.what, outp, format=args.format, use_cache=args.cache)
+    print(f"Wrote {count} records to {args.output}")
+
+
+def whatif_command(args):
+    from parser import MlParser
+    from scenarios import MlScenarioEngine, Scenario
+    with open(args.scenarios, "r", encoding="utf-8") as inp:
+        specs = json.load(inp)
+    try:
+        scenarios = [Scenario(**spec) for spec in specs]
+    except TypeError as e:
+        sys.exit("Bad scenario in " + args.scenarios + ": " + str(e))
+    parser = MlParser()
+    parser.parse_ml_csv_file(args.csv, use_cache=args.cache)
+    _write_output(json.dumps(MlScenarioEngine(parser).standings(scenarios), indent=2), args.output)
+
+
+def _add_roster_arguments(command):
+    command.add_argument("--voters", default=None, help="comma separated voter usernames (default: voter_names in MLScraper_v1.py)")
+    command.add_argument("--names", default=None, help="comma separated real names in the same order (default: the usernames)")
+
+
+def _add_site_arguments(command):
+    command.add_argument("--url", default=None, help="page to start from (default: the Music League home page)")
+    command.add_argument("--username", default=None, help="Spotify username; the password comes from ML_PASSWORD or a prompt")
+    command.add_argument("--league-xpath", default=None, help="XPath of the league on the leagues page")
+    command.add_argument("--timeout", type=float, default=10, help="seconds to wait for each element")
+    _add_roster_arguments(command)
+
+
+def build_arg_parser():
+    # Defaults that live in MLScraper_v1.py are filled in by the commands rather than here, so that --help doesn't import it
+    arg_parser = argparse.ArgumentParser(description="Scrape and analyze Music League results.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="scrape one round's results into a csv")
+    _add_site_arguments(scrape)
+    scrape.add_argument("--round-xpath", default=None, help="XPath of the round's results button on the league page")
+    scrape.add_argument("-o", "--output", default="OUTPUT.csv", help="csv to write")
+    scrape.set_defaults(handler=scrape_command)
+
+    crawl = commands.add_parser("crawl", help="scrape every round of a league into one master csv")
+    _add_site_arguments(crawl)
+    crawl.add_argument("--no-login", action="store_true", help="skip the login actions; --url is already the league page")
+    crawl.add_argument("--links-xpath", default=None, help="XPath of the round results links on the league page (default: any \"Results\" link)")
+    crawl.add_argument("-w", "--workers", type=int, default=3, help="number of browser sessions to scrape with")
+    crawl.add_argument("-o", "--output", default="MASTER.csv", help="master csv to write")
+    crawl.set_defaults(handler=crawl_command)
+
+    parse = commands.add_parser("parse", help="turn a saved results page (.html) or its text lines into a csv")
+    parse.add_argument("input", help="saved results page (.html/.htm) or text file with one line per row")
+    _add_roster_arguments(parse)
+    parse.add_argument("--round", type=int, default=None, help="write rows in the master csv layout for this round number")
+    parse.add_argument("--xpath", default=None, help="XPath of the text elements on a saved page (default: RESULTS_XPATH in MLScraper_v1.py)")
+    parse.add_argument("-o", "--output", default=None, help="csv to write instead of stdout")
+    parse.set_defaults(handler=parse_command)
+
+    analyze = commands.add_parser("analyze", help="similarity metrics for one league csv")
+    analyze.add_argument("csv", help="league csv (Round, Song, Submitter, then one column per voter)")
+    analyze.add_argument("-s", "--submitter", default=None, help="print the formatted metrics for this submitter instead of the JSON")
+    analyze.add_argument("-o", "--output", default=None, help="write here instead of stdout")
+    analyze.add_argument("--cache", action="store_true", help="use the binary cache beside the csv")
+    analyze.add_argument("--profile", choices=["text", "json"], default=None, help="print per method call counts and timings to stderr")
+    analyze.set_defaults(handler=analyze_command)
+
+    batch = commands.add_parser("batch", help="analyze every league csv in a directory or glob in parallel")
+    batch.add_argument("pattern", help="directory of league csv files, or a glob pattern matching them")
+    batch.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    batch.add_argument("-o", "--output", default=None, help="write the combined JSON here instead of stdout")
+    batch.add_argument("--cache", action="store_true", help="use the binary cache beside each csv")
+    batch.set_defaults(handler=batch_command)
+
+    serve = commands.add_parser("serve", help="answer JSON queries about one or more leagues from a local server")
+    serve.add_argument("csv", nargs="+", help="league csv to serve, as a path or <name>=<path> (default name: the file name)")
+    serve.add_argument("-p", "--port", type=int, default=8000, help="port to listen on (always on 127.0.0.1)")
+    serve.add_argument("--poll", type=float, default=1.0, help="seconds between checks for changed csv files (0 to never reload)")
+    serve.add_argument("-w", "--workers", type=int, default=None, help="number of threads answering requests")
+    serve.add_argument("--neighbors", type=int, default=3, help="most and least similar submitters returned per player")
+    serve.add_argument("--cache", action="store_true", help="use the binary cache beside each csv")
+    serve.set_defaults(handler=serve_command)
+
+    export = commands.add_parser("export", help="stream bar fight frames or player metrics of one or more leagues to a file")
+    export.add_argument("what", choices=["bar-fight", "players"], help="records to export")
+    export.add_argument("csv", nargs="+", help="league csv files, exported in order (with a \"league\" field when there are several)")
+    export.add_argument("-f", "--format", default="ndjson", help="ndjson, json or csv (see EXPORT_FORMATS in exporters.py)")
+    export.add_argument("-o", "--output", default=None, help="file to write instead of stdout")
+    export.add_argument("--cache", action="store_true", help="use the binary cache beside each csv")
+    export.set_defaults(handler=export_command)
+
+    whatif = commands.add_parser("whatif", help="standings of one league under a list of what-if scenarios")
+    whatif.add_argument("csv", help="league csv")
+    whatif.add_argument("scenarios", help="JSON list of scenarios, each a dict of scenarios.Scenario arguments, e.g. "
+                        "[{\"name\": \"no downvotes\", \"clamp\": [0, null]}, {\"name\": \"without P03\", \"exclude_voters\": [\"P03\"]}]")
+    whatif.add_argument("-o", "--output", default=None, help="write here instead of stdout")
+    whatif.add_argument("--cache", action="store_true", help="use the binary cache beside the csv")
+    whatif.set_defaults(handler=whatif_command)
+
+    return arg_parser
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    args.handler(args)
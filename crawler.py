@@ -0,0 +1,151 @@
+"""
+-------------------------------------------------------------------------------
+Crawl mode for the scraper: logs in once, finds every round's results link on the league page and scrapes the rounds concurrently over a small
+pool of browser sessions that share the login's cookies. Writes one master CSV in the Round, Song, Submitter, <voters...> layout that
+MlParser.parse_ml_csv_file expects.
+
+The login steps are MLScraper_v1.build_actions() without a round button, using the credentials and league given to the MlScraper (see
+python cli.py crawl --help).
+
+To try it against the static stand-in for the site in fixtures/site (no login needed):
+
+    python -m http.server 8000 --directory fixtures/site
+    python cli.py crawl --url http://localhost:8000/index.html --no-login --voters alice,bob,carol,dave,erin,frank,grace,heidi,ivan,judy,mallory,niaj
+-------------------------------------------------------------------------------
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import MLScraper_v1 as scraper
+
+# Every link on the league page whose text contains "results" (any case) is taken to be a round's results page
+ROUND_LINKS_XPATH = "//a[contains(translate(normalize-space(.), 'resultRESULT', 'RESULTRESULT'), 'RESULTS')]"
+
+# JavaScript returning the absolute href of every element matching an XPath, in page order, in one WebDriver round trip
+LINKS_SNAPSHOT_JS = """
+var snapshot = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var links = [];
+for (var i = 0; i < snapshot.snapshotLength; i++) {
+    links.push(snapshot.snapshotItem(i).href);
+}
+return links;
+"""
+
+
+# Function to list the results page of every round linked from the page the driver is on, in page order and without duplicates
+def discover_round_links(driver, xpath=ROUND_LINKS_XPATH):
+    links = []
+    for link in driver.execute_script(LINKS_SNAPSHOT_JS, xpath):
+        if link and link not in links:
+            links.append(link)
+    return links
+
+
+# Pool of browser sessions handed out to one thread at a time. The first session is the one that logged in; the rest are only started when every
+# existing session is busy, and are given the login's cookies so they skip the login flow
+class SessionPool:
+
+    def __init__(self, login_driver, size, driver_factory=None):
+        if driver_factory is None:
+            from selenium import webdriver
+            driver_factory = webdriver.Firefox
+        self._login_driver = login_driver
+        self._cookies = login_driver.get_cookies()
+        self._home_url = login_driver.current_url
+        self._size = size
+        self._driver_factory = driver_factory
+        self._idle = queue.Queue()
+        self._idle.put(login_driver)
+        self._started = [login_driver]
+        self._lock = threading.Lock()
+
+    def _start_session(self):
+        driver = self._driver_factory()
+        # Cookies can only be set for the site the browser is currently on
+        driver.get(self._home_url)
+        for cookie in self._cookies:
+            try:
+                driver.add_cookie(cookie)
+            except Exception as e:
+                print(f"Could not copy cookie {cookie.get('name')}: {e}")
+        return driver
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            start_new = len(self._started) < self._size
+            if start_new:
+                self._started.append(None)
+        if not start_new:
+            return self._idle.get()
+        driver = self._start_session()
+        with self._lock:
+            self._started[self._started.index(None)] = driver
+        return driver
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    # Quits every session this pool started (the login session belongs to the caller)
+    def close(self):
+        for driver in self._started:
+            if driver is not None and driver is not self._login_driver:
+                driver.quit()
+
+
+# Function to load one round's results page and return its text lines (see MLScraper_v1.get_result_lines)
+def scrape_round_lines(driver, round_url, timeout=10):
+    driver.get(round_url)
+    scraper.wait_for_results(driver, ("xpath", scraper.RESULTS_XPATH), timeout=timeout)
+    return scraper.get_result_lines(driver, scraper.RESULTS_XPATH, skip=5)
+
+
+# Function to turn one round's text lines into rows of the master CSV layout: Round, Song, Submitter, then the points from each voter (real names)
+def round_lines_to_rows(round_number, lines, voter_names, names):
+    round_df = scraper.parse_round_lines(lines, voter_names, names)
+    round_df = round_df.rename(columns={"Submitted By": "Submitter"})
+    round_df.insert(0, "Round", round_number)
+    return round_df
+
+
+# Function to scrape every round in round_links (numbered from 1 in the order given) across up to workers browser sessions. Returns the master data
+# frame sorted by round, along with a list of (round_number, seconds) timings
+def crawl_rounds(login_driver, round_links, voter_names, names, workers=3, driver_factory=None, timeout=10):
+    pool = SessionPool(login_driver, workers, driver_factory)
+
+    def scrape(round_number, round_url):
+        start = time.perf_counter()
+        driver = pool.acquire()
+        try:
+            lines = scrape_round_lines(driver, round_url, timeout=timeout)
+        finally:
+            pool.release(driver)
+        return round_lines_to_rows(round_number, lines, voter_names, names), (round_number, time.perf_counter() - start)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(scrape, range(1, len(round_links) + 1), round_links))
+    finally:
+        pool.close()
+    master_df = pd.concat([round_df for round_df, _ in results], ignore_index=True)
+    return master_df, [timing for _, timing in results]
+
+
+# Function to crawl a whole league with an MlScraper: log in (unless login is False, i.e. its url already is the league page), find the rounds and
+# scrape them all. Returns the master data frame, the list of round links and the timings of every step
+def crawl_league(league_scraper, workers=3, links_xpath=ROUND_LINKS_XPATH, login=True):
+    driver = league_scraper.login() if login else league_scraper.driver
+    round_links = discover_round_links(driver, links_xpath)
+    print(f"Found {len(round_links)} rounds.")
+    master_df, round_timings = crawl_rounds(driver, round_links, league_scraper.voter_names, league_scraper.names, workers=workers,
+                                            driver_factory=league_scraper.driver_factory, timeout=league_scraper.timeout)
+    timings = league_scraper.timings + [("round " + str(round_number), ("url", round_links[round_number - 1]), seconds)
+                                        for round_number, seconds in round_timings]
+    return master_df, round_links, timings
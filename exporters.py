@@ -0,0 +1,181 @@
+"""
+Streaming exporters: write bar fight frames or per player metrics to any text file object (a file, sys.stdout, a socket's
+makefile("w")) one record at a time, so only one league's data is held in memory however many leagues go into the export.
+
+    python cli.py export bar-fight season1.csv season2.csv -f ndjson -o bar_fight.ndjson
+    python cli.py export players league.csv -f csv -o players.csv
+
+Formats are looked up by name in EXPORT_FORMATS; register another with @export_format("<name>").
+"""
+import csv
+import itertools
+import json
+import os
+
+from analyzer import MlAnalyzer
+from parser import MlParser
+
+#   Writers by format name, each called as writer(records, output, fields) and returning the number of records written.
+EXPORT_FORMATS = {}
+
+
+###############################################################################################################################
+# function export_format(name)
+#
+#   Decorator registering a writer function under <name> in EXPORT_FORMATS.
+
+def export_format(name):
+    def register(writer):
+        EXPORT_FORMATS[name] = writer
+        return writer
+    return register
+
+
+###############################################################################################################################
+# function write_ndjson(records, output, fields = None)
+#
+#   Writes one JSON object per line. <fields> is ignored; records keep their nesting.
+
+@export_format("ndjson")
+def write_ndjson(records, output, fields = None):
+    count = 0
+    for record in records:
+        output.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+
+###############################################################################################################################
+# function write_json(records, output, fields = None)
+#
+#   Writes a JSON array with one record per line, laid out as MlParser.get_bf_format() does.
+
+@export_format("json")
+def write_json(records, output, fields = None):
+    count = 0
+    output.write("[")
+    for record in records:
+        output.write((",\n" if count else "\n") + "    " + json.dumps(record))
+        count += 1
+    output.write("\n]\n")
+    return count
+
+
+###############################################################################################################################
+# function write_csv(records, output, fields = None)
+#
+#   Writes a csv with a header row. Nested records are flattened (see flatten_record()). The columns are <fields>, or the
+#   keys of the first record when not given; a later record with a column that isn't among them is an error, while missing
+#   columns (or a nested group that is None) are left empty.
+
+@export_format("csv")
+def write_csv(records, output, fields = None):
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        if fields is not None:
+            csv.writer(output, lineterminator="\n").writerow(fields)
+        return 0
+    first = flatten_record(first)
+    writer = csv.DictWriter(output, fieldnames=fields or list(first), lineterminator="\n")
+    writer.writeheader()
+    columns = set(writer.fieldnames)
+    count = 0
+    for record in itertools.chain([first], records):
+        flat = first if count == 0 else flatten_record(record)
+        writer.writerow({key: value for key, value in flat.items() if value is not None or key in columns})
+        count += 1
+    return count
+
+
+###############################################################################################################################
+# function flatten_record(record)
+#
+#   Flattens nested dictionaries and lists into one level, joining keys with "." and numbering list entries from 1, e.g.
+#   {"most_similar": [{"name": "A"}]} becomes {"most_similar.1.name": "A"}.
+
+def flatten_record(record, prefix = ""):
+    flat = {}
+    items = enumerate(record, 1) if isinstance(record, list) else record.items()
+    for key, value in items:
+        if isinstance(value, (dict, list)):
+            flat.update(flatten_record(value, prefix + str(key) + "."))
+        else:
+            flat[prefix + str(key)] = value
+    return flat
+
+
+###############################################################################################################################
+# function bar_fight_records(parser, league = None)
+#
+#   Yields MlParser.get_bf_records(), with a "league" field first when <league> is given.
+
+def bar_fight_records(parser, league = None):
+    for record in parser.get_bf_records():
+        yield record if league is None else dict(league=league, **record)
+
+
+###############################################################################################################################
+# function player_records(analyzer, league = None)
+#
+#   Yields the stats behind get_formatted_metrics_for_submitter() for every submitter, as {"name": <submitter>, ...} with a
+#   "league" field first when <league> is given.
+
+def player_records(analyzer, league = None):
+    for name, metrics in analyzer.get_league_metrics().items():
+        record = {} if league is None else {"league": league}
+        record["name"] = name
+        record.update(metrics)
+        yield record
+
+
+###############################################################################################################################
+# function player_fields(league = False, k = 3)
+#
+#   Gets the flattened columns of player_records(), so every csv row lines up even when a submitter has fewer than <k>
+#   similar submitters or no extremes at all.
+
+def player_fields(league = False, k = 3):
+    fields = ["league"] if league else []
+    fields += ["name", "rounds", "points"]
+    for extreme in ("most_points_given", "least_points_given", "most_points_received", "least_points_received"):
+        fields += [extreme + ".name", extreme + ".points"]
+    for similar in ("most_similar", "least_similar"):
+        for place in range(1, k + 1):
+            fields += [similar + "." + str(place) + "." + key for key in ("name", "overlap", "mutual_rounds")]
+    for extreme in ("highest_round_overlap", "lowest_round_overlap"):
+        fields += [extreme + "." + key for key in ("round", "name", "overlap")]
+    return fields
+
+
+#   What can be exported: the records of one parsed league and the csv columns (given whether a league field is added).
+EXPORTS = {
+    "bar-fight": (lambda parser, analyzer, league: bar_fight_records(parser, league), lambda league: None),
+    "players": (lambda parser, analyzer, league: player_records(analyzer, league), lambda league: player_fields(league)),
+}
+
+
+###############################################################################################################################
+# function export_leagues(filenames, what, output, format = "ndjson", use_cache = False)
+#
+#   Streams the <what> records ("bar-fight" or "players") of every league csv in <filenames> to the text file object
+#   <output> in <format>, returning the number of records written. Leagues are parsed one at a time as the export reaches
+#   them; with more than one, every record gets a "league" field with the csv's name (without extension).
+
+def export_leagues(filenames, what, output, format = "ndjson", use_cache = False):
+    if what not in EXPORTS:
+        raise ValueError("Unknown export \"" + str(what) + "\".")
+    if format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format \"" + str(format) + "\".")
+    records, fields = EXPORTS[what]
+    labelled = len(filenames) > 1
+
+    def league_records(filename):
+        parser = MlParser()
+        parser.parse_ml_csv_file(filename, use_cache=use_cache)
+        league = os.path.splitext(os.path.basename(filename))[0] if labelled else None
+        return records(parser, MlAnalyzer(parser), league)
+
+    #   The generator expression keeps each league from being parsed before the previous one has been written out.
+    chained = itertools.chain.from_iterable(league_records(filename) for filename in filenames)
+    return EXPORT_FORMATS[format](chained, output, fields(labelled))
@@ -1,4 +1,17 @@
-import pandas as pd
+import bisect
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+#   pandas is imported only where a Dataframe is read or built, since importing it takes longer than loading a league from
+#   the binary cache and answering every getter that works off the arrays.
+
+
+#   Bump whenever the layout of the on-disk cache changes so stale caches are rebuilt rather than misread.
+CACHE_FORMAT = 1
 
 
 ###############################################################################################################################
@@ -11,7 +24,39 @@ class MlParser:
     ### Member Functions ######################################################################################################
 
     def __init__(self):
-        self.df = []
+        self.version = 0
+        self.reload_version = 0
+        #   Set while a profiling.Profiler is attached, which is told about every read of the full Dataframe.
+        self._profiler = None
+        self._reset()
+
+    ###########################################################################################################################
+    # function _reset()
+    #
+    #   Empties out all parsed data, leaving the parser as if nothing had been loaded.
+
+    def _reset(self):
+        self._df = []
+        self._compact = False
+        self._voters = []
+        self._voter_cols = {}
+        self._points = np.zeros((0, 0), dtype=np.int64)
+        self._points_store = None
+        self._round_col = []
+        self._song_col = []
+        self._submitter_col = []
+        self._round_rows = {}
+        self._submitter_rows = {}
+        self._song_rows = {}
+        self._round_submitter_rows = {}
+        self._round_song_rows = {}
+        self._receivers = []
+        self._receiver_idx = {}
+        self._sorted_rounds = []
+        self._round_positions = {}
+        self._receiver_first_round = np.zeros(0, dtype=np.intp)
+        self._cumulative = np.zeros((0, 0, 0), dtype=np.int32)
+        self._cumulative_store = None
 
     ###########################################################################################################################
     # function parse_ml_csv_file(filename)
@@ -31,12 +76,357 @@ class MlParser:
     #
     #   Arguments:
     #   - <filename> path to a csv file with the format as described here.
+    #   - <use_cache> when true, the parsed data is read from (or written to) a binary cache beside <filename> (see
+    #     get_cache_path()) so that later runs against an unchanged file skip parsing and aggregation entirely.
+    #   - <compact> when true, the data is held in compact dtypes: int8 points and cumulative snapshots in the narrowest
+    #     integer dtype that fits them. The Dataframe isn't kept; it is rebuilt on access with categorical "Song" and
+    #     "Submitter", an int16 "Round" and int8 point columns (see property df and memory_report()).
+    #   - <chunksize> when specified, the file is streamed <chunksize> rows at a time and each complete round is folded into
+    #     the indexes and snapshots as it arrives (see append_round()), so the whole file is never held as a raw Dataframe.
+    #     This requires the rows of each round to be contiguous and the rounds to be in ascending order.
     #
     #   Returns:
     #   - none
 
-    def parse_ml_csv_file(self, filename):
-        self.df = pd.read_csv(filename)
+    def parse_ml_csv_file(self, filename, use_cache = False, compact = False, chunksize = None):
+        if use_cache and self._load_cache(filename):
+            self._compact = compact
+            if compact:
+                self._points = self._points.astype(np.int8, copy=False)
+                self._cumulative = self._cumulative.astype(_fitting_dtype(self._cumulative), copy=False)
+        elif chunksize is not None:
+            self._stream_ml_csv_file(filename, compact, chunksize)
+            if use_cache:
+                self._save_cache(filename)
+            self.reload_version = self.version
+            return
+        else:
+            import pandas as pd
+            self._compact = compact
+            if compact:
+                voters = pd.read_csv(filename, nrows=0).columns.values[3:].tolist()
+                df = pd.read_csv(filename, dtype=self._compact_dtypes(voters))
+            else:
+                df = pd.read_csv(filename)
+            #   In compact mode the points are only kept as an array, and the Dataframe is rebuilt from it when asked for.
+            self.df = None if compact else df
+            self._round_col = df["Round"].tolist()
+            self._song_col = df["Song"].tolist()
+            self._submitter_col = df["Submitter"].tolist()
+            self._voters = df.columns.values[3:].tolist()
+            self._points = df.iloc[:, 3:].to_numpy()
+            self._build_indexes()
+            self._build_aggregates()
+            if compact:
+                self._cumulative = self._cumulative.astype(_fitting_dtype(self._cumulative), copy=False)
+            if use_cache:
+                self._save_cache(filename)
+        self._points_store = None
+        self._cumulative_store = None
+        self.version += 1
+        self.reload_version = self.version
+
+    ###########################################################################################################################
+    # function _stream_ml_csv_file(filename, compact, chunksize)
+    #
+    #   Reads <filename> in chunks of <chunksize> rows. The rows of the last round in each chunk are held back until the next
+    #   chunk, since that round may continue there, and every round before it is appended as soon as it is complete.
+
+    def _stream_ml_csv_file(self, filename, compact, chunksize):
+        import pandas as pd
+        self._reset()
+        self._compact = compact
+        dtypes = None
+        if compact:
+            dtypes = self._compact_dtypes(pd.read_csv(filename, nrows=0).columns.values[3:].tolist())
+            self._points = np.zeros((0, 0), dtype=np.int8)
+            self._cumulative = np.zeros((0, 0, 0), dtype=np.int8)
+        pending = None
+        for chunk in pd.read_csv(filename, chunksize=chunksize, dtype=dtypes):
+            if pending is not None:
+                chunk = pd.concat([pending, chunk], ignore_index=True)
+            last_round = chunk["Round"].iloc[-1]
+            complete = chunk["Round"] != last_round
+            pending = chunk.loc[~complete]
+            for _, round_rows in chunk.loc[complete].groupby("Round", sort=False):
+                self.append_round(round_rows)
+        if pending is not None:
+            self.append_round(pending)
+        #   The stores keep room to grow into; nothing more is appended while loading, so hand it back.
+        self._points = self._points.copy()
+        self._cumulative = self._cumulative.copy()
+        self._points_store = None
+        self._cumulative_store = None
+
+    ###########################################################################################################################
+    # function append_round(rows)
+    #
+    #   Adds a new round to the data set without re-parsing anything, updating the indexes and cumulative snapshots with
+    #   only the new round's rows.
+    #
+    #   Arguments:
+    #   - <rows> a Dataframe or list of dictionaries with "Round", "Song" and "Submitter" columns followed by the points
+    #     awarded by each voter, as in parse_ml_csv_file(). Every row must share a round number greater than any round
+    #     already loaded. Voters missing from <rows> are treated as having awarded zero points, and voters that haven't
+    #     been seen before are added to the data set (with zero points in all earlier rounds).
+    #
+    #   Returns:
+    #   - none
+
+    def append_round(self, rows):
+        import pandas as pd
+        new_df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        for column in ("Round", "Song", "Submitter"):
+            if column not in new_df.columns:
+                raise ValueError("Appended rows are missing the \"" + column + "\" column.")
+        if len(new_df) <= 0:
+            raise ValueError("No rows to append.")
+        round_values = new_df["Round"].unique().tolist()
+        if len(round_values) != 1:
+            raise ValueError("Appended rows must all belong to a single round.")
+        round_number = round_values[0]
+        if round_number in self._round_rows:
+            raise ValueError("Round number \"" + str(round_number) + "\" already exists.")
+        if len(self._sorted_rounds) > 0 and round_number < self._sorted_rounds[-1]:
+            raise ValueError("Round number \"" + str(round_number) + "\" comes before round \"" + str(self._sorted_rounds[-1]) + "\".")
+        voter_columns = [column for column in new_df.columns if column not in ("Round", "Song", "Submitter")]
+        if new_df[voter_columns].isna().any(axis=None):
+            raise ValueError("Appended rows are missing points for some voters.")
+        submitters = new_df["Submitter"].tolist()
+        self._widen([name for name in voter_columns if name not in self._voter_cols],
+                    sorted(set(person for person in submitters if person not in self._receiver_idx)))
+        #   Lay the new points out in the existing voter column order.
+        new_points = np.zeros((len(new_df), len(self._voters)), dtype=self._points.dtype)
+        new_points[:, [self._voter_cols[name] for name in voter_columns]] = new_df[voter_columns].to_numpy()
+        start = len(self._round_col)
+        self._points_store = _append_to_store(self._points if self._points_store is None else self._points_store, start, new_points)
+        self._points = self._points_store[:start + len(new_df)]
+        self._round_col.extend(new_df["Round"].tolist())
+        self._song_col.extend(new_df["Song"].tolist())
+        self._submitter_col.extend(submitters)
+        self._index_rows(start)
+        #   The new snapshot is the previous one plus this round's points.
+        snapshot = np.zeros((1, len(self._receivers), len(self._voters)), dtype=np.int32)
+        np.add.at(snapshot[0], [self._receiver_idx[person] for person in submitters], new_points)
+        round_idx = len(self._sorted_rounds)
+        if round_idx > 0:
+            snapshot[0] += self._cumulative[round_idx - 1]
+        #   Snapshots may be held in a narrower dtype (compact mode, or a cache written by it), so widen them if the new one
+        # doesn't fit.
+        dtype = np.promote_types(self._cumulative.dtype, _fitting_dtype(snapshot, np.int8 if self._compact else np.int32))
+        if dtype != self._cumulative.dtype:
+            self._cumulative = self._cumulative.astype(dtype)
+            self._cumulative_store = None
+        self._cumulative_store = _append_to_store(self._cumulative if self._cumulative_store is None else self._cumulative_store, round_idx, snapshot)
+        self._cumulative = self._cumulative_store[:round_idx + 1]
+        self._sorted_rounds.append(round_number)
+        self._round_positions[round_number] = round_idx
+        #   The Dataframe is reassembled from the arrays the next time it's asked for.
+        self._df = None
+        self.version += 1
+
+    ###########################################################################################################################
+    # function _widen(new_voters, new_receivers)
+    #
+    #   Makes room for voters and receivers that haven't been seen before by zero padding the existing points and snapshots;
+    #   new voters are added after the existing ones and new receivers are slotted in by name.
+
+    def _widen(self, new_voters, new_receivers):
+        if len(new_voters) > 0:
+            self._voter_cols.update({name: len(self._voters) + idx for idx, name in enumerate(new_voters)})
+            self._voters = self._voters + new_voters
+            self._points = np.pad(self._points, ((0, 0), (0, len(new_voters))))
+            self._cumulative = np.pad(self._cumulative, ((0, 0), (0, 0), (0, len(new_voters))))
+            self._points_store = None
+            self._cumulative_store = None
+        if len(new_receivers) > 0:
+            positions = [bisect.bisect_left(self._receivers, person) for person in new_receivers]
+            self._cumulative = np.insert(self._cumulative, positions, 0, axis=1)
+            self._receiver_first_round = np.insert(self._receiver_first_round, positions, len(self._sorted_rounds))
+            self._receivers = sorted(self._receivers + new_receivers)
+            self._receiver_idx = {person: idx for idx, person in enumerate(self._receivers)}
+            self._cumulative_store = None
+
+    ###########################################################################################################################
+    # property df
+    #
+    #   The internal Dataframe. When the data was loaded from the binary cache it is only assembled on first access, since
+    #   none of the getters other than get_df() need it. Every access counts as a full scan when profiling (see profiling.py).
+
+    @property
+    def df(self):
+        if self._profiler is not None:
+            self._profiler.record_scan()
+        if self._df is None:
+            import pandas as pd
+            columns = {"Round": self._round_col, "Song": self._song_col, "Submitter": self._submitter_col}
+            if self._compact:
+                points = pd.DataFrame(np.array(self._points, dtype=np.int8), columns=self._voters)
+                self._df = pd.concat([pd.DataFrame(columns), points], axis=1).astype(self._compact_dtypes(self._voters))
+            else:
+                points = pd.DataFrame(np.array(self._points, dtype=np.int64), columns=self._voters)
+                self._df = pd.concat([pd.DataFrame(columns), points], axis=1)
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        self._df = value
+
+    @staticmethod
+    def _compact_dtypes(voters):
+        dtypes = {"Round": np.int16, "Song": "category", "Submitter": "category"}
+        dtypes.update(dict.fromkeys(voters, np.int8))
+        return dtypes
+
+    ###########################################################################################################################
+    # function get_cache_path(filename)
+    #
+    #   Gets the path of the binary cache directory kept beside <filename>. It holds the point and cumulative arrays as .npy
+    #   files (memory mapped on load) plus a meta.json with the row labels and the size/mtime of the csv it was built from.
+
+    @staticmethod
+    def get_cache_path(filename):
+        return str(filename) + ".mlcache"
+
+    ###########################################################################################################################
+    # function _load_cache(filename)
+    #
+    #   Restores the parsed state of <filename> from its cache, returning False without touching anything if the cache is
+    #   missing or was built from a different version of the file.
+
+    def _load_cache(self, filename):
+        cache_path = self.get_cache_path(filename)
+        try:
+            with open(os.path.join(cache_path, "meta.json"), "r", encoding="utf-8") as inp:
+                meta = json.load(inp)
+        except (OSError, ValueError):
+            return False
+        if meta.get("key") != self._cache_key(filename):
+            return False
+        self._df = None
+        self._round_col = meta["rounds"]
+        self._song_col = meta["songs"]
+        self._submitter_col = meta["submitters"]
+        self._voters = meta["voters"]
+        self._points = np.load(os.path.join(cache_path, "points.npy"), mmap_mode="r")
+        self._build_indexes()
+        self._receivers = meta["receivers"]
+        self._receiver_idx = {person: idx for idx, person in enumerate(self._receivers)}
+        self._sorted_rounds = meta["sorted_rounds"]
+        self._round_positions = {round_number: idx for idx, round_number in enumerate(self._sorted_rounds)}
+        self._receiver_first_round = np.load(os.path.join(cache_path, "receiver_first_round.npy"))
+        self._cumulative = np.load(os.path.join(cache_path, "cumulative.npy"), mmap_mode="r")
+        return True
+
+    ###########################################################################################################################
+    # function _save_cache(filename)
+    #
+    #   Writes the current parsed state to the cache for <filename>. The meta.json is written last so that a partially
+    #   written cache is never considered valid. Arrays are written to a temporary file and then moved into place, since
+    #   parsers that loaded the previous cache still have the old files memory-mapped and must keep reading those.
+
+    def _save_cache(self, filename):
+        cache_path = self.get_cache_path(filename)
+        os.makedirs(cache_path, exist_ok=True)
+        meta_path = os.path.join(cache_path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self._save_array(cache_path, "points.npy", self._points)
+        self._save_array(cache_path, "cumulative.npy", self._cumulative)
+        self._save_array(cache_path, "receiver_first_round.npy", self._receiver_first_round)
+        meta = {
+            "key": self._cache_key(filename),
+            "rounds": self._round_col,
+            "songs": self._song_col,
+            "submitters": self._submitter_col,
+            "voters": self._voters,
+            "receivers": self._receivers,
+            "sorted_rounds": self._sorted_rounds,
+        }
+        with open(meta_path, "w", encoding="utf-8") as outp:
+            json.dump(meta, outp)
+
+    @staticmethod
+    def _save_array(cache_path, name, array):
+        fd, temp_path = tempfile.mkstemp(dir=cache_path, prefix=name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as outp:
+                np.save(outp, array)
+            os.replace(temp_path, os.path.join(cache_path, name))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def _cache_key(filename):
+        stat = os.stat(filename)
+        return {"format": CACHE_FORMAT, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    ###########################################################################################################################
+    # function _build_indexes()
+    #
+    #   Builds the lookup tables every getter answers from out of the row labels (<_round_col>, <_song_col> and
+    #   <_submitter_col>) and voter names, so that no query has to scan the whole Dataframe...
+    #
+    #   - <_round_rows>            round -> array of row positions in that round (in file order).
+    #   - <_submitter_rows>        submitter -> list of row positions they submitted a song in.
+    #   - <_song_rows>             song -> list of row positions containing that song.
+    #   - <_round_submitter_rows>  (round, submitter) -> row position of their submission.
+    #   - <_round_song_rows>       (round, song) -> row position of that song.
+    #   - <_voter_cols>            voter name -> column position in <_points>.
+    #
+    #   <_points> holds the point columns as a (rows x voters) array in the same order as the Dataframe.
+
+    def _build_indexes(self):
+        self._voter_cols = {name: idx for idx, name in enumerate(self._voters)}
+        self._round_rows = {}
+        self._submitter_rows = {}
+        self._song_rows = {}
+        self._round_submitter_rows = {}
+        self._round_song_rows = {}
+        self._index_rows(0)
+
+    ###########################################################################################################################
+    # function _index_rows(start)
+    #
+    #   Adds every row from position <start> onwards to the lookup tables.
+
+    def _index_rows(self, start):
+        round_rows = {}
+        for row in range(start, len(self._round_col)):
+            round_number, song, submitter = self._round_col[row], self._song_col[row], self._submitter_col[row]
+            round_rows.setdefault(round_number, []).append(row)
+            self._submitter_rows.setdefault(submitter, []).append(row)
+            self._song_rows.setdefault(song, []).append(row)
+            #   Only the first match is kept, mirroring the ".iloc[0]" lookups these indexes replace.
+            self._round_submitter_rows.setdefault((round_number, submitter), row)
+            self._round_song_rows.setdefault((round_number, song), row)
+        for round_number, rows in round_rows.items():
+            rows = np.array(rows, dtype=np.intp)
+            if round_number in self._round_rows:
+                rows = np.concatenate([self._round_rows[round_number], rows])
+            self._round_rows[round_number] = rows
+
+    ###########################################################################################################################
+    # function _build_aggregates()
+    #
+    #   Materializes <_cumulative>, a (rounds x receivers x voters) array where entry [r, a, b] is the total number of points
+    #   voter b gave to submitter a in every round up to and including the r-th round (in ascending round order). Receivers
+    #   are sorted by name. Any "as of round r" query is then a single snapshot lookup.
+
+    def _build_aggregates(self):
+        self._receivers = sorted(self._submitter_rows)
+        self._receiver_idx = {person: idx for idx, person in enumerate(self._receivers)}
+        self._sorted_rounds = sorted(self._round_rows)
+        self._round_positions = {round_number: idx for idx, round_number in enumerate(self._sorted_rounds)}
+        row_rounds = np.array([self._round_positions[round_number] for round_number in self._round_col], dtype=np.intp)
+        row_receivers = np.array([self._receiver_idx[person] for person in self._submitter_col], dtype=np.intp)
+        per_round = np.zeros((len(self._sorted_rounds), len(self._receivers), len(self._voters)), dtype=np.int32)
+        #   Group every row by (round, receiver) in one scatter-add, then accumulate along the rounds.
+        np.add.at(per_round, (row_rounds, row_receivers), self._points)
+        self._cumulative = np.cumsum(per_round, axis=0, dtype=np.int32)
+        self._receiver_first_round = np.full(len(self._receivers), len(self._sorted_rounds), dtype=np.intp)
+        np.minimum.at(self._receiver_first_round, row_receivers, row_rounds)
 
     ###########################################################################################################################
     # function get_df(round_number = None)
@@ -47,7 +437,7 @@ class MlParser:
         if round_number is None:
             return self.df
         else:
-            return self.df.loc[self.df["Round"] == round_number].iloc[:,1:]
+            return self.df.iloc[self._round_rows.get(round_number, []), 1:]
 
     ###########################################################################################################################
     # function get_rounds(submitter_name = None)
@@ -56,11 +446,9 @@ class MlParser:
 
     def get_rounds(self, submitter_name = None):
         if submitter_name is None:
-            seen = set()
-            seen_add = seen.add
-            return [x for x in self.df["Round"].tolist() if not (x in seen or seen_add(x))]
+            return list(self._round_rows)
         else:
-            return self.df.loc[self.df["Submitter"] == submitter_name]["Round"].tolist()
+            return [self._round_col[row] for row in self._submitter_rows.get(submitter_name, [])]
 
     ###########################################################################################################################
     # function get_songs(round_number = None, submitter_name = None)
@@ -69,25 +457,25 @@ class MlParser:
 
     def get_songs(self, round_number = None, submitter_name = None):
         #   Error checking for arguments.
-        if round_number is not None and (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        if round_number is not None and round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        if submitter_name is not None and (len(self.df.loc[self.df["Submitter"] == submitter_name]) <= 0):
+        if submitter_name is not None and submitter_name not in self._submitter_rows:
             print("Submitter \"" + str(submitter_name) + "\" does not exist.")
             return None
         #   Cases based on which arguments were provided.
         if round_number is None and submitter_name is None:
-            return self.df["Song"].tolist()
+            return list(self._song_col)
         elif round_number is not None and submitter_name is None:
-            return self.df["Song"].loc[self.df["Round"] == round_number].tolist()
+            return [self._song_col[row] for row in self._round_rows[round_number]]
         elif round_number is None and submitter_name is not None:
-            return self.df.loc[self.df["Submitter"] == submitter_name]["Song"].tolist()
+            return [self._song_col[row] for row in self._submitter_rows[submitter_name]]
         else:
-            submitter_row = self.df.loc[self.df["Submitter"] == submitter_name].loc[self.df["Round"] == round_number]
-            if (len(submitter_row["Song"]) < 1):
+            row = self._round_submitter_rows.get((round_number, submitter_name))
+            if row is None:
                 # print("No song found for submitter \"" + submitter_name + "\" in round \"" + str(round_number) + "\".")
                 return None
-            return submitter_row["Song"].iloc[0]
+            return self._song_col[row]
 
     ###########################################################################################################################
     # function get_submitters(round_number = None, song_name = None)
@@ -96,25 +484,25 @@ class MlParser:
 
     def get_submitters(self, round_number = None, song_name = None):
         #   Error checking for arguments.
-        if round_number is not None and (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        if round_number is not None and round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        if song_name is not None and (len(self.df.loc[self.df["Song"] == song_name]) <= 0):
+        if song_name is not None and song_name not in self._song_rows:
             print("Song \"" + str(song_name) + "\" does not exist.")
             return None
         #   Cases based on which arguments were provided.
         if round_number is None and song_name is None:
-            return self.df.columns.values[3:].tolist()
+            return list(self._voters)
         elif round_number is not None and song_name is None:
-            return self.df["Submitter"].loc[self.df["Round"] == round_number].tolist()
+            return [self._submitter_col[row] for row in self._round_rows[round_number]]
         elif round_number is None and song_name is not None:
-            return self.df.loc[self.df["Song"] == song_name]["Submitter"].tolist()
+            return [self._submitter_col[row] for row in self._song_rows[song_name]]
         else:
-            song_row = self.df.loc[self.df["Song"] == song_name].loc[self.df["Round"] == round_number]
-            if (len(song_row["Submitter"]) < 1):
+            row = self._round_song_rows.get((round_number, song_name))
+            if row is None:
                 # print("No submitter found for song \"" + song_name + "\" in round \"" + str(round_number) + "\".")
                 return None
-            return song_row["Submitter"].iloc[0]
+            return self._submitter_col[row]
 
     ###########################################################################################################################
     # function get_submitter_votes_for_song(round_number, song_name)
@@ -122,17 +510,16 @@ class MlParser:
     #   Gets a dictionary of vote counts for a given song for a given round <round_number>; key = submitter, value = points.
 
     def get_submitter_votes_for_song(self, round_number, song_name):
-        if (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        if round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        song_row = self.df.loc[self.df["Song"] == song_name].loc[self.df["Round"] == round_number]
-        if (len(song_row["Song"]) < 1):
+        row = self._round_song_rows.get((round_number, song_name))
+        if row is None:
             print("Song \"" + song_name + "\" not found.")
             return None
-        #   The first three columns are not point data so ignore them.
-        all_submitters_dict = song_row.iloc[0, 3:].to_dict()
-        #   Filter dict based on who was actually participating in the round <round_number>.
-        return {key: all_submitters_dict[key] for key in self.get_submitters(round_number)}
+        song_points = self._points[row]
+        #   Filter based on who was actually participating in the round <round_number>.
+        return {key: song_points[self._voter_cols[key]].item() for key in self.get_submitters(round_number)}
 
     ###########################################################################################################################
     # function get_song_votes_for_submitter(round_number, submitter_name)
@@ -140,15 +527,71 @@ class MlParser:
     #   Gets a dictionary of vote counts for a given submitter for a given round <round_number>; key = song, value = points.
 
     def get_song_votes_for_submitter(self, round_number, submitter_name):
-        if (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        if round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        if (submitter_name not in self.df.loc[self.df["Round"] == round_number]):
+        if submitter_name not in self._voter_cols:
             print("Submitter \"" + submitter_name + "\" not found in round \"" + str(round_number) + "\".")
             return None
-        submitter_col = self.df[submitter_name].loc[self.df["Round"] == round_number]
+        submitter_col = self._points[self._round_rows[round_number], self._voter_cols[submitter_name]]
         #   Create a dictionary of two different lists; being the songs and the points awarded by <submitter_name>.
-        return dict(zip(self.get_songs(round_number), submitter_col))
+        return dict(zip(self.get_songs(round_number), submitter_col.tolist()))
+
+    ###########################################################################################################################
+    # function get_vote_matrix(round_number, voters = None)
+    #
+    #   Gets a dense (songs x voters) array of the points awarded in round <round_number>. Rows follow the same order as
+    #   get_songs(round_number) and columns follow <voters> (every voter in the data set if <voters> is not specified).
+
+    def get_vote_matrix(self, round_number, voters = None):
+        if round_number not in self._round_rows:
+            print("Round number \"" + str(round_number) + "\" does not exist.")
+            return None
+        if voters is None:
+            cols = np.arange(len(self._voters))
+        else:
+            missing = [name for name in voters if name not in self._voter_cols]
+            if len(missing) > 0:
+                print("Submitter \"" + str(missing[0]) + "\" not found.")
+                return None
+            cols = np.array([self._voter_cols[name] for name in voters], dtype=np.intp)
+        return self._points[np.ix_(self._round_rows[round_number], cols)].astype(np.int16)
+
+    ###########################################################################################################################
+    # function get_vote_tensor()
+    #
+    #   Gets the votes of every round as one array, for working on the whole season at once. Returns a tuple of the rounds
+    #   (as in get_rounds()), a (rounds x songs) array of the row of each round's songs in get_df(), in the same order as
+    #   get_songs(round_number) and padded with -1 where a round has fewer songs than the largest one, and the
+    #   (rounds x songs x voters) array of points, zero where padded. Voters follow get_submitters().
+
+    def get_vote_tensor(self):
+        rounds = self.get_rounds()
+        width = max((len(self._round_rows[round_number]) for round_number in rounds), default=0)
+        rows = np.full((len(rounds), width), -1, dtype=np.intp)
+        for idx, round_number in enumerate(rounds):
+            rows[idx, :len(self._round_rows[round_number])] = self._round_rows[round_number]
+        tensor = np.zeros((len(rounds), width, len(self._voters)), dtype=np.int32)
+        tensor[rows >= 0] = self._points[rows[rows >= 0]]
+        return rounds, rows, tensor
+
+    ###########################################################################################################################
+    # function get_sparse_vote_matrix(round_number = None)
+    #
+    #   Gets the nonzero votes in coordinate (COO) form as a tuple of three equal length arrays (rows, voters, points); rows
+    #   are positions in get_df() and voters are positions in get_submitters(). Only the given round <round_number> is
+    #   included if specified.
+
+    def get_sparse_vote_matrix(self, round_number = None):
+        if round_number is not None and round_number not in self._round_rows:
+            print("Round number \"" + str(round_number) + "\" does not exist.")
+            return None
+        if round_number is None:
+            rows = np.arange(len(self._points))
+        else:
+            rows = self._round_rows[round_number]
+        row_idx, voter_idx = np.nonzero(self._points[rows])
+        return rows[row_idx], voter_idx, np.asarray(self._points[rows[row_idx], voter_idx])
 
     ###########################################################################################################################
     # function get_net_total_points_for_song(round_number, song_name)
@@ -156,15 +599,14 @@ class MlParser:
     #   Gets the total number of points awarded to <song_name> by all submitters for a given round <round_number>.
 
     def get_net_total_points_for_song(self, round_number, song_name):
-        if (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        if round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        song_row = self.df.loc[self.df["Song"] == song_name].loc[self.df["Round"] == round_number]
-        if (len(song_row["Song"]) < 1):
+        row = self._round_song_rows.get((round_number, song_name))
+        if row is None:
             print("Song \"" + song_name + "\" not found.")
             return None
-        #   The first three columns are not point data so ignore them.
-        return sum(song_row.iloc[0, 3:].tolist())
+        return self._points[row].sum().item()
 
     ###########################################################################################################################
     # function get_absolute_total_points_for_submitter(round_number, submitter_name)
@@ -173,14 +615,14 @@ class MlParser:
     #   (meaning all votes positive and negative are counted).
 
     def get_absolute_total_points_for_submitter(self, round_number, submitter_name):
-        if (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        if round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        if (submitter_name not in self.df):
+        if submitter_name not in self._voter_cols:
             print("Submitter \"" + submitter_name + "\" not found.")
             return None
-        submitter_col = self.df[submitter_name].loc[self.df["Round"] == round_number]
-        return sum(map(abs, submitter_col))
+        submitter_col = self._points[self._round_rows[round_number], self._voter_cols[submitter_name]]
+        return np.abs(submitter_col).sum().item()
 
     ###########################################################################################################################
     # function get_total_points_for_submitter(submitter_name)
@@ -188,13 +630,10 @@ class MlParser:
     #   Gets the total number of points awarded to <submitter_name> for all rounds.
 
     def get_total_points_for_submitter(self, submitter_name):
-        rounds = self.get_rounds(submitter_name=submitter_name)
-        total = 0
-        for round in rounds:
-            song = self.get_songs(submitter_name=submitter_name, round_number=round)
-            assert(isinstance(song, str))
-            total += self.get_net_total_points_for_song(round, song)
-        return total
+        if submitter_name not in self._receiver_idx:
+            return 0
+        #   The latest cumulative snapshot already holds every point <submitter_name> received from each voter.
+        return self._cumulative[-1, self._receiver_idx[submitter_name]].sum(dtype=np.int64).item()
 
     ###########################################################################################################################
     # function get_cumulative_points_awarded(round_number=None)
@@ -203,30 +642,127 @@ class MlParser:
     #   to <round_number> (all rounds in dataset if <round_number> is not specified).
 
     def get_cumulative_points_awarded(self, round_number=None):
-        if round_number is not None and (len(self.df.loc[self.df["Round"] == round_number]) <= 0):
+        totals = self.get_cumulative_points_matrix(round_number)
+        if totals is None:
+            return None
+        import pandas as pd
+        receivers, voters, snapshot = totals
+        result = pd.DataFrame(snapshot, columns=voters)
+        result.insert(0, "Submitter", receivers)
+        return result
+
+    ###########################################################################################################################
+    # function get_cumulative_points_matrix(round_number=None)
+    #
+    #   Same as get_cumulative_points_awarded() without building a Dataframe; gets a tuple of the submitters (rows), the
+    #   voters (columns) and an int64 array of the points each submitter received from each voter.
+
+    def get_cumulative_points_matrix(self, round_number=None):
+        if round_number is not None and round_number not in self._round_rows:
             print("Round number \"" + str(round_number) + "\" does not exist.")
             return None
-        #   Exclude first two columns which aren't relevant for this function.
         if round_number is not None:
-            round_subset_df = self.df.loc[self.df["Round"] <= round_number]
+            round_idx = self._round_positions[round_number]
+        else:
+            round_idx = len(self._sorted_rounds) - 1
+        #   Only submitters who had a song in some round up to <round_number> get a row, as with a groupby on the subset.
+        included = self._receiver_first_round <= round_idx
+        if round_idx >= 0:
+            snapshot = self._cumulative[round_idx, included].astype(np.int64)
         else:
-            round_subset_df = self.df
-        all_submitters = self.get_submitters()
-        agg_functions = dict(zip(all_submitters, ["sum"] * len(all_submitters)))
-        return round_subset_df.groupby(round_subset_df["Submitter"], as_index=False).aggregate(agg_functions)
+            snapshot = np.zeros((0, len(self._voters)), dtype=np.int64)
+        return [person for person, keep in zip(self._receivers, included) if keep], list(self._voters), snapshot
+
+    ###########################################################################################################################
+    # function get_bf_records()
+    #
+    #   Gets the records behind the "bar fight" visualization, one per submitter per round, in round order; each record is a
+    #   dictionary of the form {"order": <round>, "name": <submitter>, "value": <cumulative points received>}.
+
+    def get_bf_records(self):
+        #   Total points received by each submitter as of each round, from every voter at once.
+        received = self._cumulative.sum(axis=2, dtype=np.int64)
+        for round_number in self.get_rounds():
+            round_totals = received[self._round_positions[round_number]]
+            for row in self._round_rows[round_number]:
+                person = self._submitter_col[row]
+                yield {"order": round_number, "name": person, "value": round_totals[self._receiver_idx[person]].item()}
 
     ###########################################################################################################################
     # function get_bf_format()
     #
     #   Gets a specific string format for a "bar fight" visualization; data includes cumulative point totals per round for each
-    #   submitter.
+    #   submitter. The result is a JSON array with one record per line.
 
     def get_bf_format(self):
-        result = "[\n"
-        for round_number in self.get_rounds():
-            round_df = self.get_cumulative_points_awarded(round_number=round_number)
-            for person in self.get_submitters(round_number=round_number):
-                points = str(sum(round_df.loc[round_df["Submitter"] == person].iloc[0, 1:].tolist()))
-                result += "    {\"order\": " + str(round_number) + ", \"name\": \"" + person + "\", \"value\": " + points + "},\n"
-        result += "]"
-        return result
+        return "[\n" + ",\n".join("    " + json.dumps(record) for record in self.get_bf_records()) + "\n]"
+
+    ###########################################################################################################################
+    # function memory_report()
+    #
+    #   Gets a dictionary of the approximate number of bytes held by each component of the parsed data, plus their "total".
+    #   The Dataframe counts as zero while it has not been assembled (see property df). After append_round() the points and
+    #   snapshots are counted at the size of the buffers they were appended into, spare room included.
+
+    def memory_report(self):
+        report = {
+            "df": int(self._df.memory_usage(deep=True).sum()) if hasattr(self._df, "memory_usage") else 0,
+            "points": (self._points if self._points_store is None else self._points_store).nbytes,
+            "cumulative": (self._cumulative if self._cumulative_store is None else self._cumulative_store).nbytes + self._receiver_first_round.nbytes,
+            "row_labels": sum(_deep_sizeof(column) for column in (self._round_col, self._song_col, self._submitter_col)),
+            "indexes": sum(_deep_sizeof(index) for index in (self._voter_cols, self._round_rows, self._submitter_rows,
+                                                              self._song_rows, self._round_submitter_rows, self._round_song_rows)),
+        }
+        report["total"] = sum(report.values())
+        return report
+
+
+###############################################################################################################################
+# function _append_to_store(store, used, extra)
+#
+#   Writes <extra> after the first <used> entries of the preallocated array <store>, returning the array now holding them.
+#   When <store> is full (or read-only, as with a memory mapped cache) it is copied into one with double the room, so that
+#   repeated appends cost amortized O(len(extra)).
+
+def _append_to_store(store, used, extra):
+    needed = used + len(extra)
+    if needed > len(store) or not store.flags.writeable:
+        grown = np.zeros((max(needed, 2 * used),) + store.shape[1:], dtype=store.dtype)
+        grown[:used] = store[:used]
+        store = grown
+    store[used:needed] = extra
+    return store
+
+
+###############################################################################################################################
+# function _fitting_dtype(array, smallest = np.int8)
+#
+#   Gets the narrowest signed integer dtype, starting from <smallest>, that holds every value in the integer <array>.
+
+def _fitting_dtype(array, smallest = np.int8):
+    low, high = (array.min().item(), array.max().item()) if array.size > 0 else (0, 0)
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.dtype(dtype).itemsize >= np.dtype(smallest).itemsize and np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+###############################################################################################################################
+# function _deep_sizeof(obj)
+#
+#   Approximates the memory held by a container of labels or row positions, counting each distinct object once.
+
+def _deep_sizeof(obj, seen = None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(key, seen) + _deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
@@ -0,0 +1,159 @@
+import contextlib
+import json
+import math
+import sys
+import time
+
+
+###############################################################################################################################
+# class Profiler()
+#
+#   Records, per method, how often it was called, how long the calls took and how many times they read the full Dataframe
+#   (see MlParser.df). Only the objects passed to instrument() are measured, and only until restore() is called; their
+#   methods are wrapped on the instance itself, so nothing changes for other instances and nothing is measured (or slowed
+#   down) while no profiler is attached.
+
+class Profiler:
+
+    def __init__(self):
+        self.calls = {}
+        self._stack = []
+        self._instrumented = []
+
+    ###########################################################################################################################
+    # function instrument(target)
+    #
+    #   Starts measuring every public method of <target> (an MlParser or MlAnalyzer). Calls are labelled with the class
+    #   name, e.g. "MlParser.get_songs". A method called from another measured method is counted under both.
+
+    def instrument(self, target):
+        if any(target is instrumented for instrumented in self._instrumented):
+            return
+        label = type(target).__name__
+        for name in dir(type(target)):
+            if name.startswith("_") or isinstance(getattr(type(target), name), property):
+                continue
+            method = getattr(target, name)
+            if callable(method):
+                setattr(target, name, self._wrap(label + "." + name, method))
+        if hasattr(target, "_profiler"):
+            target._profiler = self
+        self._instrumented.append(target)
+
+    ###########################################################################################################################
+    # function restore()
+    #
+    #   Stops measuring, putting back the original methods of everything instrumented. What was recorded is kept.
+
+    def restore(self):
+        for target in self._instrumented:
+            for name in [name for name in vars(target) if getattr(getattr(target, name), "_profiled", False)]:
+                delattr(target, name)
+            if hasattr(target, "_profiler"):
+                target._profiler = None
+        self._instrumented = []
+
+    def _wrap(self, label, method):
+        def profiled(*args, **kwargs):
+            frame = {"scans": 0}
+            self._stack.append(frame)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._stack.pop()
+                stats = self.calls.setdefault(label, {"durations": [], "scans": 0})
+                stats["durations"].append(elapsed)
+                stats["scans"] += frame["scans"]
+        profiled._profiled = True
+        profiled.__wrapped__ = method
+        return profiled
+
+    ###########################################################################################################################
+    # function record_scan()
+    #
+    #   Called by MlParser whenever the full Dataframe is read; counts against every measured call in progress.
+
+    def record_scan(self):
+        for frame in self._stack:
+            frame["scans"] += 1
+
+    ###########################################################################################################################
+    # function summary()
+    #
+    #   Gets a JSON-serializable dictionary keyed by method with the number of "calls", the "total", "mean", "p50" and "p99"
+    #   latency (in seconds) and the number of full Dataframe "scans", slowest total first.
+
+    def summary(self):
+        summary = {}
+        for label, stats in sorted(self.calls.items(), key=lambda item: sum(item[1]["durations"]), reverse=True):
+            durations = sorted(stats["durations"])
+            summary[label] = {
+                "calls": len(durations),
+                "total": sum(durations),
+                "mean": sum(durations) / len(durations),
+                "p50": _percentile(durations, 50),
+                "p99": _percentile(durations, 99),
+                "scans": stats["scans"],
+            }
+        return summary
+
+    ###########################################################################################################################
+    # function format_summary()
+    #
+    #   Gets summary() as a text table, latencies in milliseconds.
+
+    def format_summary(self):
+        lines = [f"{'method':<50} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'scans':>6}"]
+        for label, stats in self.summary().items():
+            lines.append(f"{label:<50} {stats['calls']:>7} {stats['total'] * 1000:>10.2f} {stats['mean'] * 1000:>9.3f} "
+                         f"{stats['p50'] * 1000:>9.3f} {stats['p99'] * 1000:>9.3f} {stats['scans']:>6}")
+        return "\n".join(lines)
+
+    ###########################################################################################################################
+    # function dump(output = sys.stderr, format = "text")
+    #
+    #   Writes the summary to the file object <output>, either as the "text" table or as "json".
+
+    def dump(self, output = sys.stderr, format = "text"):
+        if format == "json":
+            output.write(json.dumps(self.summary(), indent=2) + "\n")
+        elif format == "text":
+            output.write(self.format_summary() + "\n")
+        else:
+            raise ValueError("Unknown profile format \"" + str(format) + "\".")
+
+
+###############################################################################################################################
+# function profile(*targets, output = sys.stderr, format = "text")
+#
+#   Context manager that measures the given MlParser and MlAnalyzer objects (an analyzer's parser is included with it) for
+#   the duration of the block, then dumps the summary to <output> (nothing if it is None). Yields the Profiler, so the
+#   numbers can also be read with summary() afterwards.
+#
+#       with profile(analyzer):
+#           analyzer.get_league_metrics()
+
+@contextlib.contextmanager
+def profile(*targets, output = sys.stderr, format = "text"):
+    profiler = Profiler()
+    for target in targets:
+        profiler.instrument(target)
+        if hasattr(target, "parser"):
+            profiler.instrument(target.parser)
+    try:
+        yield profiler
+    finally:
+        profiler.restore()
+        if output is not None:
+            profiler.dump(output, format)
+
+
+###############################################################################################################################
+# function _percentile(values, percent)
+#
+#   Gets the <percent> percentile of the sorted list <values> by the nearest-rank method.
+
+def _percentile(values, percent):
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
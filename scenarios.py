@@ -0,0 +1,136 @@
+"""
+What-if scoring: how the standings would have come out with a different points budget, without some voters, with some voters'
+points scaled, with downvotes clamped, or without some rounds. Every scenario is evaluated over MlParser.get_vote_tensor() in
+one batch of array operations, so sweeping hundreds of variants takes about as long as a handful.
+
+    engine = MlScenarioEngine(parser)
+    engine.standings([Scenario("as played"), Scenario("no downvotes", clamp=(0, None)), Scenario("without P03", exclude_voters=["P03"])])
+
+or from the command line, with a JSON list of Scenario keyword arguments:
+
+    python cli.py whatif league.csv scenarios.json
+"""
+import numpy as np
+
+
+###############################################################################################################################
+# class Scenario(name, exclude_voters = (), exclude_rounds = (), scale = None, clamp = None, budget = None)
+#
+#   One set of changes to the votes, applied in this order:
+#
+#     clamp           (low, high) limits on every single vote, either may be None, e.g. (0, None) drops downvotes
+#     budget          rescales each voter's ballot in each round so their upvotes add up to <budget> points
+#     scale           dictionary of voter -> factor their points are multiplied by
+#     exclude_voters  voters whose points are dropped
+#     exclude_rounds  rounds that don't count at all
+#
+#   The defaults leave the votes as they were. Unknown voters and rounds are ignored.
+
+class Scenario:
+
+    def __init__(self, name, exclude_voters = (), exclude_rounds = (), scale = None, clamp = None, budget = None):
+        self.name = name
+        self.exclude_voters = list(exclude_voters)
+        self.exclude_rounds = list(exclude_rounds)
+        self.scale = dict(scale or {})
+        self.clamp = tuple(clamp) if clamp is not None else (None, None)
+        self.budget = budget
+
+
+###############################################################################################################################
+# class MlScenarioEngine(parser)
+#
+#   Evaluates Scenario objects against the votes in MlParser <parser>. The vote tensor and the owner of every song are read
+#   once and kept until the parser changes (a reload or an appended round).
+
+class MlScenarioEngine:
+
+    def __init__(self, parser):
+        self.parser = parser
+        self._layout = None
+        self._version = None
+
+    def _sync(self):
+        if self._version != self.parser.version:
+            rounds, rows, votes = self.parser.get_vote_tensor()
+            receivers = self.parser.get_cumulative_points_matrix()[0]
+            receiver_idx = {person: idx for idx, person in enumerate(receivers)}
+            #   Which receiver each song belongs to, -1 where the tensor is padded.
+            owners = np.full(rows.shape, -1, dtype=np.intp)
+            for idx, round_number in enumerate(rounds):
+                round_submitters = self.parser.get_submitters(round_number)
+                owners[idx, :len(round_submitters)] = [receiver_idx[person] for person in round_submitters]
+            self._layout = {"rounds": rounds, "voters": self.parser.get_submitters(), "receivers": receivers, "owners": owners,
+                            "votes": votes}
+            self._version = self.parser.version
+        return self._layout
+
+    ###########################################################################################################################
+    # function evaluate(scenarios)
+    #
+    #   Gets the points every submitter would have received under each scenario. Returns a tuple of the submitters (as in
+    #   get_cumulative_points_matrix()) and a float (scenarios x submitters) array of their totals.
+
+    def evaluate(self, scenarios):
+        layout = self._sync()
+        rounds, voters, votes, owners = layout["rounds"], layout["voters"], layout["votes"], layout["owners"]
+        round_idx = {round_number: idx for idx, round_number in enumerate(rounds)}
+        voter_idx = {person: idx for idx, person in enumerate(voters)}
+        #   Per scenario weights on each voter's points and on each round, the budget (NaN for none) and the clamp limits.
+        weights = np.ones((len(scenarios), len(voters)))
+        counted = np.ones((len(scenarios), len(rounds)))
+        budgets = np.full(len(scenarios), np.nan)
+        for idx, scenario in enumerate(scenarios):
+            for person, factor in scenario.scale.items():
+                if person in voter_idx:
+                    weights[idx, voter_idx[person]] *= factor
+            weights[idx, [voter_idx[person] for person in scenario.exclude_voters if person in voter_idx]] = 0
+            counted[idx, [round_idx[round_number] for round_number in scenario.exclude_rounds if round_number in round_idx]] = 0
+            if scenario.budget is not None:
+                budgets[idx] = scenario.budget
+        received = np.zeros((len(scenarios), len(rounds), votes.shape[1]))
+        #   Clamping is the only change that can't be folded into a weight, so scenarios sharing the same limits share one
+        # clamped copy of the votes.
+        groups = {}
+        for idx, scenario in enumerate(scenarios):
+            groups.setdefault(scenario.clamp, []).append(idx)
+        for (low, high), members in groups.items():
+            clamped = votes.astype(np.float64)
+            if low is not None or high is not None:
+                np.clip(clamped, low, high, out=clamped)
+            #   [n, r, v] multiplies voter v's points in round r under scenario n; the budget rescales each ballot by how many
+            # points it handed out.
+            factors = np.broadcast_to(weights[members][:, None, :], (len(members), len(rounds), len(voters))).copy()
+            budgeted = ~np.isnan(budgets[members])
+            if budgeted.any():
+                handed_out = np.clip(clamped, 0, None).sum(axis=1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    rescale = np.where(handed_out > 0, budgets[members][budgeted][:, None, None] / handed_out, 0.0)
+                factors[budgeted] *= rescale
+            #   (rounds x songs x voters) @ (rounds x voters x scenarios) sums each song's weighted points in one product.
+            received[members] = np.matmul(clamped, factors.transpose(1, 2, 0)).transpose(2, 0, 1)
+        received *= counted[:, :, None]
+        totals = np.zeros((len(layout["receivers"]), len(scenarios)))
+        songs = owners >= 0
+        np.add.at(totals, owners[songs], received[:, songs].T)
+        return layout["receivers"], totals.T
+
+    ###########################################################################################################################
+    # function standings(scenarios)
+    #
+    #   Gets the standings under each scenario as a JSON-serializable list, in the order given, of {"scenario": <name>,
+    #   "standings": [{"rank", "name", "points"}, ...]} from the most points down. Tied submitters share a rank and keep the
+    #   order of get_cumulative_points_matrix().
+
+    def standings(self, scenarios):
+        receivers, totals = self.evaluate(scenarios)
+        results = []
+        for scenario, points in zip(scenarios, totals):
+            order = np.argsort(-points, kind="stable")
+            ranked = points[order]
+            #   Competition ranking; each submitter's rank is one more than the number of submitters strictly ahead.
+            ranks = np.searchsorted(-ranked, -ranked, side="left") + 1
+            results.append({"scenario": scenario.name,
+                            "standings": [{"rank": rank.item(), "name": receivers[idx], "points": value.item()}
+                                          for rank, idx, value in zip(ranks, order, ranked)]})
+        return results
@@ -0,0 +1,324 @@
+"""
+Local query server: loads one or more league csv files once and answers JSON requests from the warm MlParser and MlAnalyzer,
+so dashboards don't pay for re-reading the csv and recomputing the similarity on every request. It only listens on
+127.0.0.1 and needs nothing outside the standard library and what MlParser and MlAnalyzer already use.
+
+    python cli.py serve league.csv [other=other_league.csv ...] [--port 8000] [--poll 1.0]
+
+Endpoints (every response is JSON, round numbers are string keys as in batch.py):
+
+    GET /leagues                               every league with its rounds, submitters and when it was last loaded
+    GET /leagues/<league>/players              the stats behind get_formatted_metrics_for_submitter() for everyone
+    GET /leagues/<league>/players/<name>       the same for one submitter, with their top --neighbors similar submitters
+    GET /leagues/<league>/oddballs[/<round>]   find_biggest_oddballs(), or one round's oddballs
+    GET /leagues/<league>/dumpers[/<round>]    find_biggest_dumpers(), or one round's dumper
+    GET /leagues/<league>/leaderboards         the season's oddball and dumper leaderboards
+    GET /leagues/<league>/bar-fight            get_bf_format()
+
+Every league's csv is polled for changes and reloaded in the background when it is rewritten; requests keep being answered
+from the previous load until the new one is parsed and warmed up.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote, urlsplit
+
+from analyzer import MlAnalyzer
+from parser import MlParser
+
+
+###############################################################################################################################
+# class League(name, filename, use_cache = False, neighbors = 3)
+#
+#   One league served by the server; the MlParser and MlAnalyzer for its csv, loaded and warmed up by load(). MlAnalyzer's
+#   caches aren't safe to share between threads, so every query on a league goes through query(), which holds the league's
+#   lock. A reload builds the new parser and analyzer without the lock and only takes it to swap them in.
+
+class League:
+
+    def __init__(self, name, filename, use_cache = False, neighbors = 3):
+        self.name = name
+        self.filename = filename
+        self.use_cache = use_cache
+        self.neighbors = neighbors
+        self.parser = None
+        self.analyzer = None
+        self.bar_fight = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.stamp = None
+        self._lock = threading.Lock()
+
+    ###########################################################################################################################
+    # function load()
+    #
+    #   Parses the csv and runs the season-wide passes every endpoint is answered from (similarity metrics, oddballs,
+    #   dumpers and the neighbor index) and renders the bar fight feed, then swaps the result in. If parsing fails the previous
+    #   load is kept.
+
+    def load(self):
+        start = time.perf_counter()
+        stamp = file_stamp(self.filename)
+        parser = MlParser()
+        parser.parse_ml_csv_file(self.filename, use_cache=self.use_cache)
+        analyzer = MlAnalyzer(parser)
+        analyzer.get_league_metrics()
+        analyzer.find_biggest_oddballs()
+        analyzer.find_biggest_dumpers()
+        analyzer.build_neighbor_index(self.neighbors)
+        bar_fight = parser.get_bf_format()
+        with self._lock:
+            self.parser, self.analyzer = parser, analyzer
+            self.bar_fight = bar_fight
+            self.stamp = stamp
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - start
+
+    ###########################################################################################################################
+    # function query(function)
+    #
+    #   Calls function(parser, analyzer) under the league's lock and returns what it returns.
+
+    def query(self, function):
+        with self._lock:
+            return function(self.parser, self.analyzer)
+
+    def describe(self):
+        return self.query(lambda parser, analyzer: {
+            "name": self.name,
+            "filename": self.filename,
+            "rounds": parser.get_rounds(),
+            "submitters": parser.get_submitters(),
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+        })
+
+
+###############################################################################################################################
+# function file_stamp(filename)
+#
+#   Gets what the file watcher compares to notice that a csv was rewritten; its modification time and size.
+
+def file_stamp(filename):
+    stat = os.stat(filename)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+###############################################################################################################################
+# class HttpError(status, message)
+#
+#   Raised by a route to answer with an error status and {"error": <message>}.
+
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _round_number(parser, segment):
+    try:
+        round_number = int(segment)
+    except ValueError:
+        raise HttpError(HTTPStatus.NOT_FOUND, "Round number \"" + segment + "\" does not exist.")
+    if round_number not in parser.get_rounds():
+        raise HttpError(HTTPStatus.NOT_FOUND, "Round number \"" + segment + "\" does not exist.")
+    return round_number
+
+
+def _format_dumper(dumper):
+    submitter, song, voter, points = dumper
+    return {"submitter": submitter, "song": song, "voter": voter, "points": points}
+
+
+###############################################################################################################################
+# function _players(parser, analyzer, name, neighbors)
+#
+#   Gets the stats behind get_formatted_metrics_for_submitter() for everyone, or for submitter <name> along with their
+#   <neighbors> most and least similar submitters.
+
+def _players(parser, analyzer, name, neighbors):
+    metrics = analyzer.get_league_metrics()
+    if name is None:
+        return metrics
+    if name not in metrics:
+        raise HttpError(HTTPStatus.NOT_FOUND, "Submitter \"" + name + "\" does not exist.")
+    top = analyzer.calculate_top_similar_submitters(name, neighbors)
+    neighbors = {key: [{"name": entry[0], "overlap": entry[1], "mutual_rounds": entry[2]} for entry in entries] for key, entries in top.items()}
+    return dict(metrics[name], neighbors=neighbors)
+
+
+def _oddballs(parser, analyzer, segment):
+    oddballs = analyzer.find_biggest_oddballs()
+    if segment is None:
+        return {str(round_number): round_oddballs for round_number, round_oddballs in oddballs.items()}
+    return oddballs[_round_number(parser, segment)]
+
+
+def _dumpers(parser, analyzer, segment):
+    dumpers = analyzer.find_biggest_dumpers()
+    if segment is None:
+        return {str(round_number): _format_dumper(dumper) for round_number, dumper in dumpers.items()}
+    return _format_dumper(dumpers[_round_number(parser, segment)])
+
+
+def _leaderboards(parser, analyzer):
+    return {"oddballs": analyzer.get_oddball_leaderboard(), "dumpers": analyzer.get_dumper_leaderboard()}
+
+
+###############################################################################################################################
+# class MlServer(leagues, port = 8000, poll = 1.0, workers = None, neighbors = 3)
+#
+#   Serves the League objects in <leagues> (keyed by name) on 127.0.0.1:<port>. Requests are read on the event loop and
+#   answered on a pool of <workers> threads, so a slow query (say the first one after a reload) doesn't hold up the rest.
+#   Every <poll> seconds each league's csv is checked for changes (no watching if None).
+
+class MlServer:
+
+    def __init__(self, leagues, port = 8000, poll = 1.0, workers = None, neighbors = 3):
+        self.leagues = leagues
+        self.port = port
+        self.poll = poll
+        self.neighbors = neighbors
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._reloading = set()
+
+    ###########################################################################################################################
+    # function route(path)
+    #
+    #   Answers the request for <path>, returning the JSON text of the response. Runs on a worker thread.
+
+    def route(self, path):
+        segments = [unquote(segment) for segment in urlsplit(path).path.strip("/").split("/") if segment]
+        if segments == ["leagues"]:
+            return json.dumps([league.describe() for league in self.leagues.values()])
+        if len(segments) < 3 or segments[0] != "leagues":
+            raise HttpError(HTTPStatus.NOT_FOUND, "Unknown path \"" + path + "\".")
+        if segments[1] not in self.leagues:
+            raise HttpError(HTTPStatus.NOT_FOUND, "League \"" + segments[1] + "\" does not exist.")
+        league, endpoint, rest = self.leagues[segments[1]], segments[2], segments[3:]
+        if len(rest) > 1 or (rest and endpoint in ("leaderboards", "bar-fight")):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Unknown path \"" + path + "\".")
+        argument = rest[0] if rest else None
+        if endpoint == "players":
+            return json.dumps(league.query(lambda parser, analyzer: _players(parser, analyzer, argument, self.neighbors)))
+        if endpoint == "oddballs":
+            return json.dumps(league.query(lambda parser, analyzer: _oddballs(parser, analyzer, argument)))
+        if endpoint == "dumpers":
+            return json.dumps(league.query(lambda parser, analyzer: _dumpers(parser, analyzer, argument)))
+        if endpoint == "leaderboards":
+            return json.dumps(league.query(_leaderboards))
+        if endpoint == "bar-fight":
+            return league.bar_fight
+        raise HttpError(HTTPStatus.NOT_FOUND, "Unknown path \"" + path + "\".")
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            #   Headers are read and ignored; every endpoint is a GET without a body.
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                status, body = HTTPStatus.BAD_REQUEST, json.dumps({"error": "Malformed request."})
+            elif parts[0] != "GET":
+                status, body = HTTPStatus.METHOD_NOT_ALLOWED, json.dumps({"error": "Only GET is supported."})
+            else:
+                try:
+                    status, body = HTTPStatus.OK, await asyncio.get_running_loop().run_in_executor(self.executor, self.route, parts[1])
+                except HttpError as e:
+                    status, body = e.status, json.dumps({"error": e.message})
+                except Exception as e:
+                    status, body = HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": repr(e)})
+            payload = body.encode("utf-8")
+            writer.write(("HTTP/1.1 " + str(status.value) + " " + status.phrase + "\r\n"
+                          "Content-Type: application/json; charset=utf-8\r\n"
+                          "Content-Length: " + str(len(payload)) + "\r\n"
+                          "Connection: close\r\n\r\n").encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    ###########################################################################################################################
+    # function watch()
+    #
+    #   Polls every league's csv and reloads the ones that changed on a worker thread. A change is only acted on once the
+    #   file has stayed the same for a whole poll, so a csv that is still being written isn't loaded half way.
+
+    async def watch(self):
+        loop = asyncio.get_running_loop()
+        pending = {}
+        while True:
+            await asyncio.sleep(self.poll)
+            for league in self.leagues.values():
+                try:
+                    stamp = file_stamp(league.filename)
+                except OSError:
+                    continue
+                if stamp == league.stamp or league.name in self._reloading:
+                    pending.pop(league.name, None)
+                    continue
+                if pending.get(league.name) != stamp:
+                    pending[league.name] = stamp
+                    continue
+                del pending[league.name]
+                self._reloading.add(league.name)
+                loop.run_in_executor(self.executor, self._reload, league, stamp)
+
+    def _reload(self, league, stamp):
+        try:
+            league.load()
+            print(f"Reloaded {league.name} from {league.filename} in {league.load_seconds:.3f}s.", flush=True)
+        except Exception as e:
+            #   Keep serving the previous load, and don't retry until the file changes again.
+            league.stamp = stamp
+            print(f"Could not reload {league.name} from {league.filename}: {e!r}", flush=True)
+        finally:
+            self._reloading.discard(league.name)
+
+    ###########################################################################################################################
+    # function serve()
+    #
+    #   Loads every league (in parallel on the worker threads) and serves until cancelled.
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, league.load) for league in self.leagues.values()])
+        for league in self.leagues.values():
+            print(f"Loaded {league.name} from {league.filename} in {league.load_seconds:.3f}s.", flush=True)
+        server = await asyncio.start_server(self.handle, "127.0.0.1", self.port)
+        print(f"Serving on http://127.0.0.1:{self.port}/leagues", flush=True)
+        watcher = asyncio.create_task(self.watch()) if self.poll is not None else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            self.executor.shutdown(wait=False)
+
+
+###############################################################################################################################
+# function league_arguments(arguments)
+#
+#   Gets the League objects keyed by name for the command line's csv arguments, each either a path or <name>=<path>. Names
+#   default to the file name without its extension.
+
+def league_arguments(arguments, use_cache = False, neighbors = 3):
+    leagues = {}
+    for argument in arguments:
+        name, separator, filename = argument.partition("=")
+        if not separator:
+            filename = argument
+            name = os.path.splitext(os.path.basename(argument))[0]
+        if name in leagues:
+            raise ValueError("League name \"" + name + "\" is used more than once.")
+        leagues[name] = League(name, filename, use_cache=use_cache, neighbors=neighbors)
+    return leagues